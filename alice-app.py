@@ -13,16 +13,23 @@ HOW TO RUN:
 """
 
 import streamlit as st
-import random
-import hashlib
 import time
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import json
 import os
+import sqlite3
 from pathlib import Path
 
+from bb84_engine import prepare_qubits_packed, sift_packed
+from bb84_qber import sample_qber, DEFAULT_SAMPLE_FRACTION
+from cascade_reconciliation import cascade_reconcile
+from ldpc_reconciliation import MAX_LDPC_QBER, ldpc_reconcile
+from privacy_amplification import derive_final_key
+from packed_bits import PackedBits, as_packed
+from session_store import SessionStore, DEFAULT_SESSION
+from shared_state import VersionConflict
+
 # Configure page
 st.set_page_config(
     page_title="BB84 - Alice (Sender)",
@@ -31,8 +38,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Shared state file path
-SHARED_STATE_FILE = Path("shared_bb84_state.json")
+# Shared session database path
+SHARED_STATE_DB = Path("shared_bb84_state.db")
+
+# Seconds between page updates while waiting for the other app
+WAIT_HEARTBEAT = 1.0
 
 # Custom CSS for Alice's theme
 st.markdown("""
@@ -72,14 +82,8 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def load_shared_state():
-    """Load shared state from file"""
-    if SHARED_STATE_FILE.exists():
-        try:
-            with open(SHARED_STATE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
+def default_shared_state():
+    """Fresh protocol state"""
     return {
         "alice_bits": [],
         "alice_bases": [],
@@ -102,86 +106,94 @@ def load_shared_state():
         "huot_ready": False
     }
 
+@st.cache_resource
+def get_state_store():
+    """Versioned per-session store the apps share, kept across reruns so its read cache survives"""
+    return SessionStore(SHARED_STATE_DB, default_shared_state)
+
+state_store = get_state_store()
+
+def load_shared_state(session_id):
+    """Load one session's shared state from the database"""
+    try:
+        return state_store.load(session_id)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        st.error(f"❌ Cannot read {SHARED_STATE_DB}: {e}")
+        st.stop()
+
 def save_shared_state(state):
-    """Save shared state to file"""
+    """Save the changed fields of shared state, merged with what other apps saved meanwhile"""
     try:
-        with open(SHARED_STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        state_store.save(state)
+    except VersionConflict as e:
+        st.warning(f"⚠️ {e}. Their update shows on the next refresh; repeat your last action if needed.")
     except Exception as e:
         st.error(f"Error saving state: {e}")
 
+def wait_for_partner(session_id, version):
+    """Block until another app saves this session, then rerun to show it
+
+    The script thread of this viewer stays blocked while it waits (idle,
+    not querying), and the wake-up comes from the store's watcher thread
+    polling the database every WATCH_INTERVAL, so up to 20 ms after the save.
+    """
+    status = st.empty()
+    started = time.monotonic()
+    while not state_store.wait_for_change(session_id, version, timeout=WAIT_HEARTBEAT):
+        # Touching the page lets Streamlit interrupt the wait when the user clicks something
+        status.caption(f"⏳ Waiting for your partner... {int(time.monotonic() - started)}s")
+    st.rerun()
+
 def generate_qubits(num_qubits, method="random"):
     """Generate Alice's qubits"""
-    bits = []
-    bases = []
-    
-    for i in range(num_qubits):
-        if method == "random":
-            bits.append(random.randint(0, 1))
-            bases.append(random.randint(0, 1))
-        else:
-            # Manual mode - could be expanded for interactive selection
-            bits.append(random.randint(0, 1))
-            bases.append(random.randint(0, 1))
-    
-    return bits, bases
+    # Manual mode - could be expanded for interactive selection, random for now
+    return prepare_qubits_packed(num_qubits)
 
 def perform_sifting(alice_bits, alice_bases, partner_bases, partner_results):
     """Perform basis sifting"""
-    sifted_bits = []
-    matching_indices = []
-    
     # Ensure all arrays have the same length
     min_length = min(len(alice_bits), len(alice_bases), len(partner_bases), len(partner_results))
     
-    for i in range(min_length):
-        if alice_bases[i] == partner_bases[i]:
-            sifted_bits.append(int(partner_results[i]))  # Ensure integer
-            matching_indices.append(i)
+    sifted_bits, matching_indices = sift_packed(
+        as_packed(alice_bases)[:min_length], partner_bases, partner_results)
     
-    return sifted_bits, matching_indices
+    return PackedBits.from_array(sifted_bits), matching_indices
 
-def error_checking(alice_bits, sifted_bits, matching_indices, has_eavesdropper=False):
-    """Perform error checking"""
-    total_bits = len(sifted_bits)
-    if total_bits == 0:
-        return 0.0, 0, []
-    
-    errors = 0
-    
-    for idx in range(total_bits):
-        if idx < len(matching_indices) and matching_indices[idx] < len(alice_bits):
-            alice_bit = alice_bits[matching_indices[idx]]
-            partner_bit = sifted_bits[idx]
-            if alice_bit != partner_bit:
-                errors += 1
+def error_checking(alice_bits, sifted_bits, matching_indices, sample_fraction=DEFAULT_SAMPLE_FRACTION):
+    """Estimate the error rate from a random sample of the sifted bits"""
+    if len(sifted_bits) == 0:
+        return None, sifted_bits, matching_indices
     
-    if has_eavesdropper:
-        additional_errors = random.randint(1, max(1, total_bits // 15))
-        errors += additional_errors
+    estimate = sample_qber(alice_bits, sifted_bits, matching_indices, sample_fraction)
     
-    error_rate = errors / total_bits if total_bits > 0 else 0
+    # The sampled bits were compared publicly, so remove them from the key
+    remaining_bits = PackedBits.from_array(estimate.discard(sifted_bits))
+    remaining_indices = estimate.discard(matching_indices)
     
-    # Remove bits used for error checking
-    sacrifice_count = min(errors + 1, max(1, len(sifted_bits) // 8))
-    remaining_bits = sifted_bits[:-sacrifice_count] if sacrifice_count > 0 and sacrifice_count < len(sifted_bits) else sifted_bits
-    
-    return error_rate, errors, remaining_bits
+    return estimate, remaining_bits, remaining_indices
+
+def reconcile_keys(alice_bits, sifted_bits, matching_indices, error_rate, method="Cascade"):
+    """Correct the partner's sifted bits towards Alice's with Cascade or LDPC
+
+    Above MAX_LDPC_QBER no LDPC code is rated to decode, so Cascade is used.
+    """
+    alice_key = as_packed(alice_bits).take(matching_indices)
+    if method == "LDPC" and error_rate <= MAX_LDPC_QBER:
+        # One syndrome message; frames that fail to decode are dropped
+        result = ldpc_reconcile(alice_key, sifted_bits, error_rate)
+        matching_indices = np.asarray(matching_indices, dtype=np.int64)[result.kept]
+    else:
+        result = cascade_reconcile(alice_key, sifted_bits, error_rate)
+    return PackedBits.from_array(result.corrected_key), matching_indices, result
 
-def generate_final_key(sifted_bits):
+def generate_final_key(sifted_bits, error_rate=0.0, leaked_bits=None):
     """Generate final key"""
     if not sifted_bits or len(sifted_bits) < 4:
         return None
     
     try:
-        bit_string = ''.join(str(int(b)) for b in sifted_bits)
-        while len(bit_string) % 8 != 0:
-            bit_string += '0'
-        
-        byte_data = bytes(int(bit_string[i:i+8], 2) for i in range(0, len(bit_string), 8))
-        final_key = hashlib.sha256(byte_data).hexdigest()
-        
-        return final_key
+        # Toeplitz privacy amplification down to the secure key length
+        return derive_final_key(sifted_bits, error_rate, leaked_bits=leaked_bits)
     except (ValueError, TypeError, OverflowError):
         return None
 
@@ -190,11 +202,17 @@ def main():
     st.markdown('<h1 class="main-header">🎭 ALICE - Quantum Sender</h1>', 
                 unsafe_allow_html=True)
     
-    # Load current state
-    shared_state = load_shared_state()
-    
     # Sidebar controls
     st.sidebar.title("🎭 Alice's Controls")
+    session_id = st.sidebar.text_input(
+        "Session ID",
+        value=DEFAULT_SESSION,
+        help="Alice and her partner must use the same session ID"
+    ).strip() or DEFAULT_SESSION
+    
+    # Load current state
+    shared_state = load_shared_state(session_id)
+    
     st.sidebar.markdown("**Role:** Quantum bit sender")
     
     # Partner Selection
@@ -240,6 +258,10 @@ def main():
     st.sidebar.subheader("Configuration")
     num_qubits = st.sidebar.slider("Number of Qubits", 10, 150, 20)
     prep_method = st.sidebar.selectbox("Preparation Method", ["random", "manual"])
+    sample_fraction = st.sidebar.slider("QBER Sample Fraction", 0.05, 0.5, DEFAULT_SAMPLE_FRACTION,
+                                        help="Share of sifted bits publicly compared to estimate the error rate")
+    reconciliation = st.sidebar.selectbox("Reconciliation", ["Cascade", "LDPC"],
+                                          help="Interactive parity checks, or a single LDPC syndrome message")
     eve_present = st.sidebar.checkbox("Simulate Eavesdropper", value=shared_state.get("eve_present", False))
     
     # Update eavesdropper setting
@@ -358,17 +380,32 @@ def main():
                 
                 if st.button("🔍 Check Errors"):
                     with st.spinner("Checking for errors..."):
-                        error_rate, errors, remaining_bits = error_checking(
+                        estimate, remaining_bits, remaining_indices = error_checking(
                             shared_state["alice_bits"],
                             shared_state["sifted_bits"],
                             shared_state["matching_indices"],
-                            shared_state["eve_present"]
+                            sample_fraction
                         )
-                        shared_state["error_rate"] = error_rate
-                        shared_state["sifted_bits"] = remaining_bits
+                        if estimate:
+                            shared_state["error_rate"] = estimate.error_rate
+                            shared_state["qber_ci"] = [estimate.ci_low, estimate.ci_high]
+                            shared_state["qber_sample_size"] = estimate.sample_size
+                        # Cascade or LDPC reconciliation before privacy amplification
+                        reconciled_bits, reconciled_indices, result = reconcile_keys(
+                            shared_state["alice_bits"],
+                            remaining_bits,
+                            remaining_indices,
+                            shared_state["error_rate"],
+                            reconciliation
+                        )
+                        shared_state["sifted_bits"] = reconciled_bits
+                        shared_state["matching_indices"] = reconciled_indices
+                        shared_state["leaked_bits"] = result.leaked_bits
+                        shared_state["corrected_errors"] = result.corrected_errors
                         shared_state["phase"] = "key_generation"
                         save_shared_state(shared_state)
-                    st.success(f"✅ Error check complete! Rate: {error_rate:.3f}")
+                    st.success(f"✅ Error check complete! Rate: {shared_state['error_rate']:.3f}, "
+                               f"{shared_state['corrected_errors']} errors corrected by {reconciliation}")
                     st.rerun()
             
             elif shared_state["phase"] == "key_generation":
@@ -386,8 +423,7 @@ def main():
                     col_a, col_b = st.columns(2)
                     with col_a:
                         if st.button("🔄 Restart Protocol"):
-                            if SHARED_STATE_FILE.exists():
-                                SHARED_STATE_FILE.unlink()
+                            state_store.reset(session_id)
                             st.rerun()
                     
                     with col_b:
@@ -398,7 +434,9 @@ def main():
                 else:
                     if st.button("🔐 Generate Key"):
                         with st.spinner("Generating final key..."):
-                            final_key = generate_final_key(shared_state["sifted_bits"])
+                            final_key = generate_final_key(shared_state["sifted_bits"],
+                                                           shared_state.get("error_rate", 0.0),
+                                                           shared_state.get("leaked_bits"))
                             if final_key:
                                 shared_state["final_key"] = final_key
                                 shared_state["phase"] = "complete"
@@ -451,8 +489,8 @@ def main():
                 
                 if sample_size > 0:
                     # Validate data before creating DataFrame
-                    valid_bits = alice_bits[:sample_size]
-                    valid_bases = alice_bases[:sample_size]
+                    valid_bits = list(alice_bits[:sample_size])
+                    valid_bases = list(alice_bases[:sample_size])
                     
                     # Ensure both arrays have exactly the same length
                     if len(valid_bits) == len(valid_bases) == sample_size:
@@ -484,6 +522,10 @@ def main():
             
             if shared_state.get("error_rate"):
                 st.metric("Error Rate", f"{shared_state['error_rate']:.3f}")
+            if shared_state.get("qber_ci"):
+                ci_low, ci_high = shared_state["qber_ci"]
+                st.caption(f"95% CI: {ci_low:.3f} – {ci_high:.3f} "
+                           f"({shared_state.get('qber_sample_size', 0)} bits sampled)")
     
     # Visualization
     if shared_state.get("alice_bits") and shared_state.get("alice_bases"):
@@ -504,7 +546,7 @@ def main():
             # Alice's bits
             fig.add_trace(go.Scatter(
                 x=x_vals,
-                y=alice_bits[:display_limit],
+                y=list(alice_bits[:display_limit]),
                 mode='markers+lines',
                 name='Bit Values',
                 marker=dict(color='pink', size=8),
@@ -514,7 +556,7 @@ def main():
             # Alice's bases
             fig.add_trace(go.Scatter(
                 x=x_vals,
-                y=alice_bases[:display_limit],
+                y=list(alice_bases[:display_limit]),
                 mode='markers+lines',
                 name='Basis Choice',
                 marker=dict(color='lightcoral', size=8),
@@ -594,15 +636,13 @@ def main():
         
         # Reset option
         if st.button("🔄 Start New Protocol"):
-            if SHARED_STATE_FILE.exists():
-                SHARED_STATE_FILE.unlink()
+            state_store.reset(session_id)
             st.rerun()
     
-    # Auto-refresh for real-time updates
+    # Rerun as soon as the other app moves the protocol on
     waiting_phases = [f"waiting_{selected_partner}_response", f"waiting_{selected_partner}_measurement"]
     if shared_state["phase"] in waiting_phases:
-        time.sleep(2)
-        st.rerun()
+        wait_for_partner(session_id, shared_state.version)
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,231 @@
+"""
+BB84 Streaming Pipeline
+Generator-based block pipeline for arbitrarily long key exchanges
+
+HOW TO RUN:
+    python bb84_pipeline.py --qubits 1000000000            # one billion qubits
+    python bb84_pipeline.py --qubits 0 --eve               # run until Ctrl+C
+
+Instead of one pass over full lists, fixed-size blocks of qubits flow
+through each protocol stage (prepare/transmit/measure -> sift -> error
+check -> reconcile -> final key) as a chain of generators. Only the block in flight is
+held in memory, so memory use stays constant however many qubits are
+sent, and finished key material is emitted block by block.
+"""
+
+import argparse
+import time
+import numpy as np
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from bb84_engine import run_exchange_packed, sift_packed, Exchange
+from bb84_qber import sample_qber, DEFAULT_SAMPLE_FRACTION
+from bb84_random import get_rng, make_rng, BACKENDS, DEFAULT_BACKEND
+from cascade_reconciliation import cascade_reconcile
+from ldpc_reconciliation import MAX_LDPC_QBER, ldpc_reconcile
+from privacy_amplification import privacy_amplify, secure_key_length
+
+DEFAULT_BLOCK_QUBITS = 1 << 20
+
+# Blocks whose error rate exceeds this are treated as compromised and dropped
+DEFAULT_MAX_QBER = 0.15
+
+
+class SiftedBlock(NamedTuple):
+    """Alice's and Bob's bits where their bases matched"""
+    index: int
+    num_qubits: int
+    alice_key: np.ndarray
+    bob_key: np.ndarray
+
+
+class CheckedBlock(NamedTuple):
+    """Sifted block after error checking, with the checked bits removed"""
+    index: int
+    num_qubits: int
+    alice_key: np.ndarray
+    bob_key: np.ndarray
+    errors: int
+    error_rate: float
+
+
+class ReconciledBlock(NamedTuple):
+    """Checked block after reconciliation, with Bob's key corrected"""
+    index: int
+    num_qubits: int
+    key: np.ndarray
+    error_rate: float
+    corrected_errors: int
+    leaked_bits: int
+
+
+class KeyBlock(NamedTuple):
+    """Final key material produced from one block"""
+    index: int
+    num_qubits: int
+    sifted_bits: int
+    error_rate: float
+    key: bytes
+
+
+def exchange_blocks(total_qubits: Optional[int] = None,
+                    block_qubits: int = DEFAULT_BLOCK_QUBITS,
+                    eve_present: bool = False,
+                    rng: Optional[np.random.Generator] = None) -> Iterator[Exchange]:
+    """Stage 1: prepare, transmit and measure one block of qubits at a time
+
+    With total_qubits=None the stream never ends (continuous key generation).
+    """
+    if block_qubits <= 0:
+        raise ValueError(f"block_qubits must be positive, got {block_qubits}")
+    return _exchange_blocks(total_qubits, block_qubits, eve_present, get_rng(rng))
+
+
+def _exchange_blocks(total_qubits: Optional[int], block_qubits: int, eve_present: bool,
+                     rng: np.random.Generator) -> Iterator[Exchange]:
+    """Generator behind exchange_blocks, so bad arguments fail at the call"""
+    sent = 0
+    while total_qubits is None or sent < total_qubits:
+        size = block_qubits if total_qubits is None else min(block_qubits, total_qubits - sent)
+        yield run_exchange_packed(size, eve_present, rng)
+        sent += size
+
+
+def sift_blocks(exchanges: Iterable[Exchange]) -> Iterator[SiftedBlock]:
+    """Stage 2: keep only the positions where Alice's and Bob's bases match"""
+    for index, exchange in enumerate(exchanges):
+        bob_key, matching_indices = sift_packed(
+            exchange.alice_bases, exchange.bob_bases, exchange.bob_results)
+        yield SiftedBlock(index, len(exchange.alice_bits),
+                          exchange.alice_bits.take(matching_indices), bob_key)
+
+
+def check_blocks(sifted: Iterable[SiftedBlock],
+                 sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                 rng: Optional[np.random.Generator] = None) -> Iterator[CheckedBlock]:
+    """Stage 3: estimate the error rate from a random sample and discard those bits"""
+    for block in sifted:
+        estimate = sample_qber(block.alice_key, block.bob_key,
+                               sample_fraction=sample_fraction, rng=rng)
+        yield CheckedBlock(block.index, block.num_qubits,
+                           estimate.discard(block.alice_key), estimate.discard(block.bob_key),
+                           estimate.errors, estimate.error_rate)
+
+
+def reconcile_blocks(checked: Iterable[CheckedBlock],
+                     max_qber: float = DEFAULT_MAX_QBER,
+                     method: str = "cascade",
+                     rng: Optional[np.random.Generator] = None) -> Iterator[ReconciledBlock]:
+    """Stage 4: error correction of each block below max_qber
+
+    method is "cascade" (interactive) or "ldpc" (one syndrome message per
+    block); LDPC blocks above MAX_LDPC_QBER, where no code is rated to
+    decode, fall back to Cascade. Blocks above the threshold are treated as
+    compromised and dropped.
+    """
+    for block in checked:
+        if block.error_rate > max_qber:
+            continue
+        if method == "ldpc" and block.error_rate <= MAX_LDPC_QBER:
+            result = ldpc_reconcile(block.alice_key, block.bob_key, block.error_rate)
+        else:
+            result = cascade_reconcile(block.alice_key, block.bob_key, block.error_rate, rng=rng)
+        yield ReconciledBlock(block.index, block.num_qubits, result.corrected_key,
+                              block.error_rate, result.corrected_errors, result.leaked_bits)
+
+
+def key_blocks(reconciled: Iterable[ReconciledBlock],
+               rng: Optional[np.random.Generator] = None) -> Iterator[KeyBlock]:
+    """Stage 5: Toeplitz privacy amplification of each reconciled block
+
+    The output length follows secure_key_length() with the bits Cascade
+    disclosed; blocks with no secure bits left are dropped. Each block
+    gets a fresh public Toeplitz seed.
+    """
+    rng = get_rng(rng)
+    for block in reconciled:
+        output_bits = secure_key_length(len(block.key), block.error_rate, block.leaked_bits)
+        output_bits -= output_bits % 8
+        if output_bits <= 0:
+            continue
+        key = privacy_amplify(block.key, output_bits, rng.bytes(32))
+        yield KeyBlock(block.index, block.num_qubits, len(block.key),
+                       block.error_rate, key)
+
+
+def run_pipeline(total_qubits: Optional[int] = None,
+                 block_qubits: int = DEFAULT_BLOCK_QUBITS,
+                 eve_present: bool = False,
+                 max_qber: float = DEFAULT_MAX_QBER,
+                 sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                 reconciliation: str = "cascade",
+                 rng: Optional[np.random.Generator] = None) -> Iterator[KeyBlock]:
+    """Chain every stage and yield finished key blocks as they are produced"""
+    rng = get_rng(rng)
+    exchanges = exchange_blocks(total_qubits, block_qubits, eve_present, rng)
+    checked = check_blocks(sift_blocks(exchanges), sample_fraction, rng)
+    return key_blocks(reconcile_blocks(checked, max_qber, reconciliation, rng), rng)
+
+
+def positive_int(text: str) -> int:
+    """argparse type for sizes that must be at least 1"""
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming BB84 key generation")
+    parser.add_argument("--qubits", type=int, default=100_000_000,
+                        help="total qubits to send, 0 = run until interrupted")
+    parser.add_argument("--block-size", type=positive_int, default=DEFAULT_BLOCK_QUBITS,
+                        help="qubits per pipeline block")
+    parser.add_argument("--eve", action="store_true", help="simulate an eavesdropper")
+    parser.add_argument("--max-qber", type=float, default=DEFAULT_MAX_QBER,
+                        help="drop blocks with a higher error rate")
+    parser.add_argument("--sample-fraction", type=float, default=DEFAULT_SAMPLE_FRACTION,
+                        help="share of sifted bits compared to estimate the QBER")
+    parser.add_argument("--reconciliation", choices=["cascade", "ldpc"], default="cascade",
+                        help="error correction: interactive Cascade or one-way LDPC syndromes")
+    parser.add_argument("--rng", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="randomness backend (system = os.urandom)")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible run (NumPy backends)")
+    parser.add_argument("--output", help="append key material to this binary file")
+    args = parser.parse_args()
+
+    total = args.qubits or None
+    out = open(args.output, "ab") if args.output else None
+    qubits_done = key_bytes = 0
+    start = time.perf_counter()
+
+    print("🔬 BB84 streaming pipeline")
+    print(f"Qubits: {total or 'unlimited'}, block size: {args.block_size}, "
+          f"eavesdropper: {'YES' if args.eve else 'NO'}, rng: {args.rng}")
+    try:
+        for block in run_pipeline(total, args.block_size, args.eve,
+                                  args.max_qber, args.sample_fraction, args.reconciliation,
+                                  make_rng(args.rng, args.seed)):
+            # Blocks dropped for a high error rate still count as sent qubits
+            qubits_done = (block.index + 1) * args.block_size
+            if total:
+                qubits_done = min(qubits_done, total)
+            key_bytes += len(block.key)
+            if out:
+                out.write(block.key)
+            elapsed = time.perf_counter() - start
+            print(f"Block {block.index + 1}: QBER {block.error_rate:.3f}, "
+                  f"{key_bytes} key bytes, {qubits_done / elapsed / 1e6:.1f}M qubits/s",
+                  end="\r")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped.")
+    finally:
+        if out:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Done: {key_bytes} key bytes in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+BB84 QBER Estimation
+Sampled quantum bit error rate estimate with a confidence interval
+
+Alice and Bob publicly compare a random test subset of the sifted key
+instead of every bit. Only the sampled positions are gathered and
+compared, so the comparison cost scales with the sample size. The
+sampled bits are disclosed and must then be removed from both keys,
+which QBEREstimate.discard does for any array aligned with the sifted key.
+"""
+
+import math
+import numpy as np
+from statistics import NormalDist
+from typing import NamedTuple, Optional, Tuple
+
+from bb84_random import get_rng
+from packed_bits import PackedBits
+
+DEFAULT_SAMPLE_FRACTION = 0.25
+DEFAULT_CONFIDENCE = 0.95
+
+
+class QBEREstimate(NamedTuple):
+    """Result of comparing a random sample of the sifted key"""
+    error_rate: float
+    errors: int
+    sample_size: int
+    ci_low: float
+    ci_high: float
+    confidence: float
+    sampled_positions: np.ndarray
+
+    def discard(self, values) -> np.ndarray:
+        """Drop the sampled (now public) positions from a sifted-key-aligned array"""
+        values = np.asarray(values)
+        keep = np.ones(len(values), dtype=bool)
+        keep[self.sampled_positions] = False
+        return np.compress(keep, values)
+
+
+def wilson_interval(errors: int, sample_size: int,
+                    confidence: float = DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+    """Wilson score interval for an error proportion"""
+    if sample_size == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = errors / sample_size
+    denom = 1 + z * z / sample_size
+    centre = (p + z * z / (2 * sample_size)) / denom
+    margin = z * math.sqrt(p * (1 - p) / sample_size + z * z / (4 * sample_size ** 2)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def _take(bits, positions: np.ndarray) -> np.ndarray:
+    """Gather bits from a PackedBits, array or list"""
+    if isinstance(bits, PackedBits):
+        return bits.take(positions)
+    return np.asarray(bits, dtype=np.uint8)[positions]
+
+
+def sample_qber(alice_bits, sifted_bits, matching_indices=None,
+                sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                sample_size: Optional[int] = None,
+                confidence: float = DEFAULT_CONFIDENCE,
+                rng: Optional[np.random.Generator] = None) -> QBEREstimate:
+    """Estimate the QBER from a random subset of the sifted key
+
+    sifted_bits is Bob's sifted key. alice_bits is either Alice's full
+    qubit record, indexed through matching_indices, or (when
+    matching_indices is None) her sifted key aligned with Bob's.
+    sample_size overrides sample_fraction when given.
+    """
+    rng = get_rng(rng)
+    total_bits = len(sifted_bits)
+    if sample_size is None:
+        sample_size = int(round(total_bits * sample_fraction))
+    sample_size = min(total_bits, max(1, sample_size)) if total_bits else 0
+
+    positions = np.sort(rng.choice(total_bits, size=sample_size, replace=False))
+    alice_positions = positions if matching_indices is None else \
+        np.asarray(matching_indices)[positions]
+
+    errors = int(np.count_nonzero(_take(alice_bits, alice_positions) != _take(sifted_bits, positions)))
+    error_rate = errors / sample_size if sample_size else 0.0
+    ci_low, ci_high = wilson_interval(errors, sample_size, confidence)
+    return QBEREstimate(error_rate, errors, sample_size, ci_low, ci_high, confidence, positions)
@@ -0,0 +1,105 @@
+"""
+Bit Utilities
+Fast conversion between bit sequences, bytes and hex
+
+Bits are packed most significant bit first, the same order the apps have
+always used, and a trailing partial byte is padded with zeros. With NumPy
+installed the conversions are single np.packbits/np.unpackbits calls;
+without it they go through Python's arbitrary-precision int, which
+converts base-2 strings in linear time, so no path loops per bit in
+Python.
+"""
+
+from typing import Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback
+    np = None
+
+Bits = Union[Sequence[int], "np.ndarray"]
+
+# bytes.translate tables between 0/1 byte values and ASCII '0'/'1'
+_TO_ASCII = bytes(range(48, 50)) + bytes(254)
+_FROM_ASCII = bytes(48) + bytes([0, 1]) + bytes(206)
+
+
+def _pack_py(bits: Bits) -> bytes:
+    """Pure-Python pack via a base-2 int"""
+    digits = bytes(bits).translate(_TO_ASCII)
+    if not digits:
+        return b""
+    digits += b"0" * (-len(digits) % 8)
+    return int(digits, 2).to_bytes(len(digits) // 8, "big")
+
+
+def _unpack_py(data: bytes, count: Optional[int] = None) -> bytes:
+    """Pure-Python unpack via a base-2 int, one 0/1 byte per bit"""
+    if not data:
+        return b""
+    digits = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")
+    return digits.encode("ascii").translate(_FROM_ASCII)[:count]
+
+
+def pack_bits(bits: Bits) -> bytes:
+    """Pack 0/1 values into bytes, MSB first, zero-padding the last byte"""
+    if np is not None:
+        return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
+    return _pack_py(bits)
+
+
+def unpack_bits(data: bytes, count: Optional[int] = None) -> Bits:
+    """Expand bytes into 0/1 values (uint8 array with NumPy, else bytes)
+
+    count keeps only the first count bits.
+    """
+    if np is not None:
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count)
+    return _unpack_py(data, count)
+
+
+def bits_to_hex(bits: Bits) -> str:
+    """Hex string of the packed bits"""
+    return pack_bits(bits).hex()
+
+
+def hex_to_bits(hex_string: str, count: Optional[int] = None) -> Bits:
+    """0/1 values of a hex string, optionally only the first count bits"""
+    return unpack_bits(bytes.fromhex(hex_string), count)
+
+
+def bit_slice(data: bytes, start: int, stop: int) -> bytes:
+    """Bits start..stop of packed data, repacked from bit 0"""
+    stop = min(stop, len(data) * 8)
+    if stop <= start:
+        return b""
+    if np is not None:
+        chunk = np.frombuffer(data, dtype=np.uint8)[start // 8:(stop + 7) // 8]
+        offset = start % 8
+        return np.packbits(np.unpackbits(chunk)[offset:offset + stop - start]).tobytes()
+    width = stop - start
+    value = (int.from_bytes(data, "big") >> (len(data) * 8 - stop)) & ((1 << width) - 1)
+    pad = -width % 8
+    return (value << pad).to_bytes((width + pad) // 8, "big")
+
+
+def xor_bits(a: Bits, b: Bits) -> Bits:
+    """Bitwise XOR of two bit sequences, truncated to the shorter one"""
+    length = min(len(a), len(b))
+    if np is not None:
+        return np.bitwise_xor(np.asarray(a[:length], dtype=np.uint8),
+                              np.asarray(b[:length], dtype=np.uint8))
+    value = int.from_bytes(_pack_py(a[:length]), "big") ^ int.from_bytes(_pack_py(b[:length]), "big")
+    return _unpack_py(value.to_bytes((length + 7) // 8, "big"), length)
+
+
+def xor_bytes(data: bytes, key: bytes) -> bytes:
+    """XOR data with the first len(data) bytes of key, whole buffers at a time"""
+    key = key[:len(data)]
+    if len(key) < len(data):
+        raise ValueError(f"Key too short! Need {len(data)} bytes, have {len(key)} bytes")
+    if np is not None:
+        return np.bitwise_xor(np.frombuffer(data, dtype=np.uint8),
+                              np.frombuffer(key, dtype=np.uint8)).tobytes()
+    value = int.from_bytes(data, "big") ^ int.from_bytes(key, "big")
+    return value.to_bytes(len(data), "big")
@@ -10,13 +10,17 @@ HOW TO RUN:
 """
 
 import streamlit as st
-import random
 import time
 import pandas as pd
 import plotly.graph_objects as go
-import json
+import sqlite3
 from pathlib import Path
 
+from bb84_engine import transmit_qubits_packed, measure_qubits_packed, sift_packed
+from packed_bits import as_packed
+from session_store import SessionStore, DEFAULT_SESSION
+from shared_state import VersionConflict
+
 # Configure page
 st.set_page_config(
     page_title="BB84 - Bob (Receiver)",
@@ -25,8 +29,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Shared state file path
-SHARED_STATE_FILE = Path("shared_bb84_state.json")
+# Shared session database path
+SHARED_STATE_DB = Path("shared_bb84_state.db")
+
+# Seconds between page updates while waiting for the other app
+WAIT_HEARTBEAT = 1.0
 
 # Custom CSS for Bob's theme
 st.markdown("""
@@ -66,14 +73,8 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def load_shared_state():
-    """Load shared state from file"""
-    if SHARED_STATE_FILE.exists():
-        try:
-            with open(SHARED_STATE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
+def default_shared_state():
+    """Fresh protocol state"""
     return {
         "alice_bits": [],
         "alice_bases": [],
@@ -91,57 +92,70 @@ def load_shared_state():
         "bob_ready": False
     }
 
+@st.cache_resource
+def get_state_store():
+    """Versioned per-session store the apps share, kept across reruns so its read cache survives"""
+    return SessionStore(SHARED_STATE_DB, default_shared_state)
+
+state_store = get_state_store()
+
+def load_shared_state(session_id):
+    """Load one session's shared state from the database"""
+    try:
+        return state_store.load(session_id)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        st.error(f"❌ Cannot read {SHARED_STATE_DB}: {e}")
+        st.stop()
+
 def save_shared_state(state):
-    """Save shared state to file"""
+    """Save the changed fields of shared state, merged with what other apps saved meanwhile"""
     try:
-        with open(SHARED_STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        state_store.save(state)
+    except VersionConflict as e:
+        st.warning(f"⚠️ {e}. Their update shows on the next refresh; repeat your last action if needed.")
     except Exception as e:
         st.error(f"Error saving state: {e}")
 
+def wait_for_partner(session_id, version):
+    """Block until another app saves this session, then rerun to show it
+
+    The script thread of this viewer stays blocked while it waits (idle,
+    not querying), and the wake-up comes from the store's watcher thread
+    polling the database every WATCH_INTERVAL, so up to 20 ms after the save.
+    """
+    status = st.empty()
+    started = time.monotonic()
+    while not state_store.wait_for_change(session_id, version, timeout=WAIT_HEARTBEAT):
+        # Touching the page lets Streamlit interrupt the wait when the user clicks something
+        status.caption(f"⏳ Waiting for Alice... {int(time.monotonic() - started)}s")
+    st.rerun()
+
 def simulate_measurement(alice_bases, alice_bits, method="random", eve_present=False):
     """Simulate Bob's measurements with better data handling"""
-    bob_bases = []
-    bob_results = []
-    
     # Ensure clean input data
-    transmitted_bits = [int(b) if b in [0, 1, '0', '1'] else 0 for b in alice_bits]
-    
-    if eve_present:
-        for i in range(len(transmitted_bits)):
-            if random.random() < 0.6:  # 60% interception
-                if random.random() < 0.5:  # Wrong basis 50% of time
-                    transmitted_bits[i] = random.randint(0, 1)
+    alice_bits = as_packed(alice_bits)
     
-    for i in range(len(alice_bases)):
-        # Bob chooses measurement basis
-        if method == "random":
-            basis = random.randint(0, 1)
-        else:
-            basis = random.randint(0, 1)  # Simplified
-        
-        bob_bases.append(basis)
-        
-        # Measurement result - ensure integer
-        if alice_bases[i] == basis:
-            result = int(transmitted_bits[i])
-        else:
-            result = random.randint(0, 1)
-        
-        bob_results.append(result)
+    transmitted_bits, _ = transmit_qubits_packed(alice_bits, alice_bases, eve_present)
     
-    return bob_bases, bob_results
+    # Bob chooses measurement bases - manual strategy is simplified to random
+    return measure_qubits_packed(alice_bases, transmitted_bits)
 
 def main():
     # Header
     st.markdown('<h1 class="main-header">🔬 BOB - Quantum Receiver</h1>', 
                 unsafe_allow_html=True)
     
-    # Load current state
-    shared_state = load_shared_state()
-    
     # Sidebar controls
     st.sidebar.title("🔬 Bob's Controls")
+    session_id = st.sidebar.text_input(
+        "Session ID",
+        value=DEFAULT_SESSION,
+        help="Use the same session ID as Alice"
+    ).strip() or DEFAULT_SESSION
+    
+    # Load current state
+    shared_state = load_shared_state(session_id)
+    
     st.sidebar.markdown("**Role:** Quantum bit receiver")
     
     # Configuration
@@ -250,7 +264,7 @@ def main():
             df_bob = pd.DataFrame({
                 'Q#': range(1, sample_size + 1),
                 'Basis': ['+' if b == 0 else '×' for b in shared_state["bob_bases"][:sample_size]],
-                'Result': shared_state["bob_results"][:sample_size],
+                'Result': list(shared_state["bob_results"][:sample_size]),
                 'Match': ['✓' if shared_state["alice_bases"][i] == shared_state["bob_bases"][i] 
                          else '✗' for i in range(sample_size)]
             })
@@ -276,7 +290,7 @@ def main():
         # Bob's bases
         fig.add_trace(go.Scatter(
             x=list(range(1, display_limit + 1)),
-            y=shared_state["bob_bases"][:display_limit],
+            y=list(shared_state["bob_bases"][:display_limit]),
             mode='markers+lines',
             name='Bob Basis',
             marker=dict(color='lightblue', size=8),
@@ -287,7 +301,7 @@ def main():
         if shared_state.get("alice_bases"):
             fig.add_trace(go.Scatter(
                 x=list(range(1, display_limit + 1)),
-                y=shared_state["alice_bases"][:display_limit],
+                y=list(shared_state["alice_bases"][:display_limit]),
                 mode='markers+lines',
                 name='Alice Basis',
                 marker=dict(color='pink', size=6),
@@ -297,7 +311,7 @@ def main():
         # Bob's results
         fig.add_trace(go.Scatter(
             x=list(range(1, display_limit + 1)),
-            y=shared_state["bob_results"][:display_limit],
+            y=list(shared_state["bob_results"][:display_limit]),
             mode='markers+lines',
             name='Measurement Result',
             marker=dict(color='cyan', size=8),
@@ -319,8 +333,10 @@ def main():
         
         # Matching statistics
         if shared_state.get("alice_bases"):
-            matches = sum(1 for i in range(len(shared_state["bob_bases"])) 
-                         if shared_state["alice_bases"][i] == shared_state["bob_bases"][i])
+            _, matching_indices = sift_packed(shared_state["alice_bases"],
+                                              shared_state["bob_bases"],
+                                              shared_state["bob_results"])
+            matches = len(matching_indices)
             match_rate = matches / len(shared_state["bob_bases"]) * 100
             
             st.metric("Basis Match Rate", f"{match_rate:.1f}%")
@@ -381,10 +397,9 @@ def main():
         5. Decrypt Alice's encrypted messages!
         """)
     
-    # Auto-refresh for real-time updates
+    # Rerun as soon as the other app moves the protocol on
     if shared_state["phase"] in ["greeting", "preparation", "transmission", "sifting", "error_check", "key_generation"]:
-        time.sleep(2)
-        st.rerun()
+        wait_for_partner(session_id, shared_state.version)
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,279 @@
+"""
+OTP Key Store
+Server-side pool of BB84 keys with one-time consumption tracking
+
+Keys enter the store from the bb84_key_*.txt reports the key generators
+save, or by direct deposit. Consumption is tracked per key material (its
+SHA-256), not per ID: encryption atomically reserves the next unused
+byte range, so no pad byte is ever handed out twice, and decryption may
+only read ranges that were already reserved. A second ID for the same
+bytes (a report loaded from file and deposited again, say) becomes an
+alias sharing the original offset.
+
+Offsets, key IDs and directly deposited keys are saved to a small JSON
+state file (written to a temp file and renamed) so one-time use survives
+restarts, and every change holds an advisory lock on it so several
+server worker processes sharing one key directory see each other's
+deposits and never hand out the same bytes.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from shared_state import atomic_write_json, file_lock
+
+KEY_FILE_PATTERN = "bb84_key_*.txt"
+KEY_FILE_MARKER = "FINAL KEY (hex):"
+STATE_FILE_NAME = "key_store_state.json"
+
+# Seconds between directory scans triggered by requests for unknown key IDs
+RESCAN_INTERVAL = 2.0
+
+
+class KeyStoreError(ValueError):
+    """Unknown key, exhausted key or an invalid range"""
+
+
+class Reservation(NamedTuple):
+    """Pad bytes handed out for one encryption"""
+    key_id: str
+    offset: int
+    key_bytes: bytes
+
+
+def parse_key_file(path: str) -> Optional[bytes]:
+    """Key bytes from a bb84_key_*.txt report, or None if it has no key
+
+    The marker is matched case-insensitively so the Streamlit download
+    ("Final Key (hex):") loads as well as the terminal app's report.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    markers = [line.upper() for line in lines]
+    if KEY_FILE_MARKER.upper() not in markers:
+        return None
+    for line in lines[markers.index(KEY_FILE_MARKER.upper()) + 1:]:
+        if line and not line.startswith("="):
+            return bytes.fromhex(line)
+    return None
+
+
+def write_key_file(key_hex: str, directory: str = ".", details: Optional[dict] = None) -> str:
+    """Save a key report in the bb84_key_*.txt format and return its path"""
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(directory, f"bb84_key_{timestamp}.txt")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"bb84_key_{timestamp}_{suffix}.txt")
+        suffix += 1
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("=" * 60 + "\n")
+        f.write("BB84 Quantum Key Generation Results\n")
+        f.write("=" * 60 + "\n\n")
+        f.write(f"Generated: {time.ctime()}\n")
+        for name, value in (details or {}).items():
+            f.write(f"{name}: {value}\n")
+        f.write("\n" + KEY_FILE_MARKER + "\n")
+        f.write("=" * 60 + "\n")
+        f.write(key_hex + "\n")
+        f.write("=" * 60 + "\n")
+    return path
+
+
+class KeyStore:
+    """Thread-safe key pool handing out each pad byte at most once"""
+
+    def __init__(self, directory: str = ".", state_path: Optional[str] = None):
+        self.directory = directory
+        self.state_path = state_path or os.path.join(directory, STATE_FILE_NAME)
+        # key ID -> fingerprint (SHA-256 hex) of its material; aliases share one
+        self._ids: Dict[str, str] = {}
+        self._material: Dict[str, bytes] = {}
+        # fingerprint -> bytes handed out so far
+        self._used: Dict[str, int] = {}
+        # fingerprint -> hex of keys deposited directly (not backed by a report file)
+        self._deposits: Dict[str, str] = {}
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+        with self._state_lock():
+            self._load_state()
+
+    # Deposits
+
+    def _register(self, key_id: str, key_bytes: bytes, persist: bool):
+        """Map key_id to its material (caller holds both locks with state loaded)"""
+        fingerprint = hashlib.sha256(key_bytes).hexdigest()
+        existing = self._ids.get(key_id)
+        if existing is not None and existing != fingerprint:
+            raise KeyStoreError(f"Key ID {key_id} is already in use")
+        self._ids[key_id] = fingerprint
+        self._material.setdefault(fingerprint, key_bytes)
+        self._used.setdefault(fingerprint, 0)
+        if persist:
+            self._deposits[fingerprint] = key_bytes.hex()
+
+    def deposit(self, key_bytes: bytes, key_id: Optional[str] = None) -> str:
+        """Add a key and return its ID (derived from the key when not given)
+
+        Bytes already in the store under another ID keep their offset, so
+        the new ID is only an alias and never restarts the pad.
+        """
+        if not key_bytes:
+            raise KeyStoreError("Key is empty")
+        key_id = key_id or "k" + hashlib.sha256(key_bytes).hexdigest()[:16]
+        with self._lock, self._state_lock():
+            self._load_state()
+            self._register(key_id, key_bytes, persist=True)
+            self._save_state()
+        return key_id
+
+    def load_key_files(self, pattern: str = KEY_FILE_PATTERN) -> List[str]:
+        """Deposit every key report in the store directory; returns new key IDs"""
+        self._last_scan = time.monotonic()
+        found = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, pattern))):
+            key_id = os.path.splitext(os.path.basename(path))[0]
+            if self._ids.get(key_id) in self._material:
+                continue
+            try:
+                key_bytes = parse_key_file(path)
+            except (OSError, ValueError):
+                continue
+            if key_bytes:
+                found[key_id] = key_bytes
+        if not found:
+            return []
+
+        added = []
+        with self._lock, self._state_lock():
+            self._load_state()
+            for key_id, key_bytes in found.items():
+                try:
+                    self._register(key_id, key_bytes, persist=False)
+                except KeyStoreError:
+                    continue
+                added.append(key_id)
+            self._save_state()
+        return added
+
+    # Consumption
+
+    def _key(self, key_id: str) -> Tuple[str, bytes]:
+        """Fingerprint and material of a key ID"""
+        fingerprint = self._ids.get(key_id)
+        key_bytes = self._material.get(fingerprint)
+        if key_bytes is None:
+            raise KeyStoreError(f"Unknown key ID {key_id}")
+        return fingerprint, key_bytes
+
+    def _ensure_loaded(self, key_id: str):
+        """Pick up new key reports and other processes' deposits for an unknown ID
+
+        Misses rescan at most every RESCAN_INTERVAL, so requests naming
+        bogus IDs cannot make every call glob the directory.
+        """
+        if self._ids.get(key_id) in self._material:
+            return
+        if time.monotonic() - self._last_scan < RESCAN_INTERVAL:
+            return
+        self.load_key_files()
+        if self._ids.get(key_id) not in self._material:
+            with self._lock, self._state_lock():
+                self._load_state()
+
+    def reserve(self, key_id: str, length: int) -> Reservation:
+        """Atomically take the next length unused bytes of a key"""
+        self._ensure_loaded(key_id)
+        with self._lock, self._state_lock():
+            self._load_state()
+            fingerprint, key_bytes = self._key(key_id)
+            offset = self._used[fingerprint]
+            if offset + length > len(key_bytes):
+                raise KeyStoreError(
+                    f"Key {key_id} exhausted! Need {length * 8} bits, "
+                    f"have {(len(key_bytes) - offset) * 8} unused bits")
+            self._used[fingerprint] = offset + length
+            self._save_state()
+        return Reservation(key_id, offset, key_bytes[offset:offset + length])
+
+    def claim(self, key_id: str, offset: int, length: int) -> bytes:
+        """Take the exact range a peer holding the same key issued
+
+        Refused if any of it may already have been handed out here;
+        unused bytes before offset are skipped so both sides stay aligned.
+        """
+        self._ensure_loaded(key_id)
+        with self._lock, self._state_lock():
+            self._load_state()
+            fingerprint, key_bytes = self._key(key_id)
+            if offset < self._used[fingerprint] or offset + length > len(key_bytes):
+                raise KeyStoreError(f"Range {offset}-{offset + length} of key {key_id} is not available")
+            self._used[fingerprint] = offset + length
+            self._save_state()
+        return key_bytes[offset:offset + length]
+
+    def read(self, key_id: str, offset: int, length: int) -> bytes:
+        """Pad bytes of an already reserved range, for decryption
+
+        Ranges that were never reserved are refused, so decryption cannot
+        be used to read pad bytes before they are used.
+        """
+        self._ensure_loaded(key_id)
+        with self._lock:
+            fingerprint, key_bytes = self._key(key_id)
+            if offset + length > self._used[fingerprint]:
+                # Possibly reserved by another process since we last looked
+                with self._state_lock():
+                    self._load_state()
+            if offset < 0 or offset + length > self._used[fingerprint]:
+                raise KeyStoreError(f"Range {offset}-{offset + length} of key {key_id} was never issued")
+            return key_bytes[offset:offset + length]
+
+    def info(self) -> List[dict]:
+        """Size and usage of every key, without key material; aliases listed with the first ID"""
+        with self._lock:
+            ids: Dict[str, List[str]] = {}
+            for key_id, fingerprint in self._ids.items():
+                if fingerprint in self._material:
+                    ids.setdefault(fingerprint, []).append(key_id)
+            return [{"key_id": names[0], "aliases": names[1:],
+                     "bytes": len(self._material[fingerprint]), "used": self._used[fingerprint],
+                     "remaining": len(self._material[fingerprint]) - self._used[fingerprint]}
+                    for fingerprint, names in ids.items()]
+
+    # Persistence
+
+    def _state_lock(self):
+        """Exclusive advisory lock shared by every process using the state file"""
+        return file_lock(self.state_path + ".lock")
+
+    def _load_state(self):
+        """Merge the saved state; offsets only grow, so keep the larger one"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for fingerprint, key_hex in saved.get("deposits", {}).items():
+            if fingerprint not in self._material:
+                self._material[fingerprint] = bytes.fromhex(key_hex)
+                self._deposits[fingerprint] = key_hex
+        for key_id, fingerprint in saved.get("ids", {}).items():
+            self._ids.setdefault(key_id, fingerprint)
+        for fingerprint, used in saved.get("used", {}).items():
+            self._used[fingerprint] = max(self._used.get(fingerprint, 0), int(used))
+        for fingerprint in self._material:
+            self._used.setdefault(fingerprint, 0)
+
+    def _save_state(self):
+        """Write the state to a temp file, sync it and rename it into place"""
+        atomic_write_json(self.state_path, {
+            "used": self._used,
+            "ids": self._ids,
+            "deposits": self._deposits,
+        })
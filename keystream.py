@@ -0,0 +1,48 @@
+"""
+XOF Keystream
+Expand a short BB84 key into a long keystream with SHAKE-256
+
+Strict OTP needs one key byte per message byte, so a 256-bit BB84 key
+covers only 32 bytes. In keystream mode the key seeds SHAKE-256 together
+with a per-message nonce and the XOF output is used as the pad. One
+exchange then covers any amount of traffic, at the price of
+computational rather than information-theoretic secrecy. Security rests
+on never reusing a (key, nonce) pair; nonces are 128 random bits by
+default, so reuse is negligible for a single key.
+"""
+
+import hashlib
+import os
+
+# Stored-key bytes taken as the seed for one keystream message
+XOF_SEED_BYTES = 32
+
+# Shortest key accepted as a seed (128 bits)
+MIN_XOF_KEY_BYTES = 16
+
+XOF_NONCE_BYTES = 16
+
+# Separates this use of SHAKE-256 from others on the same key material
+_DOMAIN = b"BB84-OTP-XOF-v1"
+
+
+def new_nonce() -> bytes:
+    """Fresh random nonce for one message"""
+    return os.urandom(XOF_NONCE_BYTES)
+
+
+def xof_keystream(key: bytes, nonce: bytes, length: int) -> bytes:
+    """length pad bytes from SHAKE-256(domain, key, nonce)
+
+    The key is length-prefixed so (key, nonce) splits cannot collide.
+    """
+    if len(key) < MIN_XOF_KEY_BYTES:
+        raise ValueError(f"Keystream mode needs a key of at least {MIN_XOF_KEY_BYTES * 8} bits, "
+                         f"have {len(key) * 8} bits")
+    if not nonce:
+        raise ValueError("Keystream mode needs a nonce")
+    xof = hashlib.shake_256(_DOMAIN)
+    xof.update(len(key).to_bytes(4, "big"))
+    xof.update(key)
+    xof.update(nonce)
+    return xof.digest(length)
@@ -0,0 +1,304 @@
+"""
+BB84 Key Management Service
+Local key delivery REST API modelled on ETSI GS QKD 014
+
+One instance runs at each end of the link as that site's KME, serving
+one local SAE (the application) and paired with the KME at the other
+site. Both KMEs read the same BB84 final keys (bb84_key_*.txt, which
+Alice's and Bob's runs produce identically), each from its own site's
+key directory, so key material never crosses the wire. A KME reserves
+through the directory's shared KeyStore state, so the OTP encryption
+service running on the same key directory never hands out the same pad
+bytes:
+
+    GET       /api/v1/keys/{slave_SAE_ID}/status
+    GET|POST  /api/v1/keys/{slave_SAE_ID}/enc_keys    number, size (bits)
+    GET|POST  /api/v1/keys/{master_SAE_ID}/dec_keys   key_ID(s)
+
+Keys are registered in batches ahead of use: a background refill
+reserves fresh bytes from the local pool, gives each key a UUID and
+tells the peer KME which pool range those IDs name; the peer claims the
+same range (refusing any it may already have issued) and holds the keys
+until its SAE calls dec_keys, which delivers each key once from memory.
+enc_keys for the default key size then just pops ready keys from
+memory (a few microseconds, no fsync and no peer round trip) and
+tops the batch up in the background. Other sizes, or a request larger
+than the ready batch, reserve and register inline, which costs a state
+file fsync plus one HTTP round trip to the peer (about 2 ms in process,
+3-4 ms over HTTP on localhost). Both directions share one pool safely:
+a range issued by both sides at once is refused by both and simply
+skipped.
+
+Known limits, as in a demo: pending and ready keys live only in memory,
+so restarting a KME discards them and their pool ranges stay used (no
+key is ever reissued, the bytes are just lost). If the peer accepts a
+batch but its reply is lost, the SAE gets a 503 while the peer holds
+keys nobody will ask for; they are likewise wasted, not reused.
+
+Two local instances stand in for the two sites, each with its own copy
+of the key reports (in one directory, each would refuse the ranges the
+other issued):
+
+    python kms_service.py --kme-id KME_A --sae-id SAE_A --peer-sae-id SAE_B \\
+        --port 8001 --peer-url http://localhost:8002 --key-dir site_a
+    python kms_service.py --kme-id KME_B --sae-id SAE_B --peer-sae-id SAE_A \\
+        --port 8002 --peer-url http://localhost:8001 --key-dir site_b
+
+SAE authentication (mutual TLS in the standard) is out of scope for the
+demo; run it on localhost only.
+"""
+
+import argparse
+import base64
+import json
+import os
+import threading
+import urllib.request
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from flask import Flask, jsonify, request
+
+from key_store import KeyStore, KeyStoreError
+
+DEFAULT_KEY_SIZE = 256
+MIN_KEY_SIZE = 64
+MAX_KEY_SIZE = 8192
+MAX_KEYS_PER_REQUEST = 128
+MAX_KEY_COUNT = 100000
+
+# Seconds to wait for the peer KME to confirm new key IDs
+PEER_TIMEOUT = 5
+
+# Default-size keys registered with the peer ahead of enc_keys calls
+READY_KEYS = 128
+# Refill the ready batch once it drops below this many keys
+REFILL_BELOW = 32
+
+
+class KMSError(ValueError):
+    """Request the KME cannot serve; status is the HTTP code to answer with"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class KMS:
+    """One site's key management entity"""
+
+    def __init__(self, kme_id: str, sae_id: str, peer_kme_id: str, peer_sae_id: str,
+                 peer_url: str, key_dir: str = "."):
+        self.kme_id = kme_id
+        self.sae_id = sae_id
+        self.peer_kme_id = peer_kme_id
+        self.peer_sae_id = peer_sae_id
+        self.peer_url = peer_url.rstrip("/")
+        # The directory's shared state, so other services on it never reuse our bytes
+        self.store = KeyStore(key_dir)
+        self.store.load_key_files()
+        # key_ID -> key bytes issued by the peer, awaiting our SAE's dec_keys
+        self._pending: Dict[str, bytes] = {}
+        # Default-size keys the peer already holds, handed out by enc_keys
+        self._ready: Deque[Tuple[str, bytes]] = deque()
+        self._refilling = False
+        self._lock = threading.Lock()
+
+    def _check_peer_sae(self, sae_id: str):
+        if sae_id != self.peer_sae_id:
+            raise KMSError(f"SAE {sae_id} is not connected to {self.kme_id}", 404)
+
+    def status(self, slave_sae_id: str) -> dict:
+        """Status of the link to a slave SAE"""
+        self._check_peer_sae(slave_sae_id)
+        remaining = sum(k["remaining"] for k in self.store.info())
+        return {
+            "source_KME_ID": self.kme_id,
+            "target_KME_ID": self.peer_kme_id,
+            "master_SAE_ID": self.sae_id,
+            "slave_SAE_ID": slave_sae_id,
+            "key_size": DEFAULT_KEY_SIZE,
+            "stored_key_count": remaining * 8 // DEFAULT_KEY_SIZE + len(self._ready),
+            "max_key_count": MAX_KEY_COUNT,
+            "max_key_per_request": MAX_KEYS_PER_REQUEST,
+            "max_key_size": MAX_KEY_SIZE,
+            "min_key_size": MIN_KEY_SIZE,
+            "max_SAE_ID_count": 0,
+        }
+
+    def enc_keys(self, slave_sae_id: str, number: int = 1, size: int = DEFAULT_KEY_SIZE) -> List[dict]:
+        """New keys for our SAE, registered with the peer KME before delivery"""
+        self._check_peer_sae(slave_sae_id)
+        if not 1 <= number <= MAX_KEYS_PER_REQUEST:
+            raise KMSError(f"number must be between 1 and {MAX_KEYS_PER_REQUEST}")
+        if not MIN_KEY_SIZE <= size <= MAX_KEY_SIZE or size % 8:
+            raise KMSError(f"size must be a multiple of 8 between {MIN_KEY_SIZE} and {MAX_KEY_SIZE}")
+
+        keys = self._take_ready(number) if size == DEFAULT_KEY_SIZE else None
+        if keys is None:
+            keys = self._register_keys(number, size)
+        return [{"key_ID": key_id, "key": base64.b64encode(key).decode("ascii")}
+                for key_id, key in keys]
+
+    def _take_ready(self, number: int):
+        """Pre-registered default-size keys, or None if the batch is too small"""
+        with self._lock:
+            keys = [self._ready.popleft() for _ in range(number)] if len(self._ready) >= number else None
+            low = len(self._ready) < REFILL_BELOW
+        if low:
+            self.refill(background=True)
+        return keys
+
+    def refill(self, background: bool = False):
+        """Top the ready batch up to READY_KEYS; a failed refill is retried on the next call"""
+        with self._lock:
+            if self._refilling:
+                return
+            self._refilling = True
+        if background:
+            threading.Thread(target=self._refill, daemon=True).start()
+        else:
+            self._refill()
+
+    def _refill(self):
+        """Register a batch with the peer (runs with _refilling set)"""
+        try:
+            missing = READY_KEYS - len(self._ready)
+            if missing > 0:
+                keys = self._register_keys(missing, DEFAULT_KEY_SIZE)
+                with self._lock:
+                    self._ready.extend(keys)
+        except (KMSError, KeyStoreError):
+            pass
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _register_keys(self, number: int, size: int) -> List[Tuple[str, bytes]]:
+        """Reserve keys from the pool and register their IDs with the peer"""
+        key_bytes = size // 8
+        total = number * key_bytes
+        pool_id = next((k["key_id"] for k in self.store.info() if k["remaining"] >= total), None)
+        if pool_id is None:
+            self.store.load_key_files()
+            pool_id = next((k["key_id"] for k in self.store.info() if k["remaining"] >= total), None)
+        if pool_id is None:
+            raise KMSError("Not enough BB84 key material; run another exchange", 503)
+        reservation = self.store.reserve(pool_id, total)
+
+        keys = [(str(uuid.uuid4()), reservation.key_bytes[i * key_bytes:(i + 1) * key_bytes])
+                for i in range(number)]
+        self._notify_peer({
+            "master_SAE_ID": self.sae_id,
+            "pool_key": pool_id,
+            "offset": reservation.offset,
+            "size": size,
+            "key_IDs": [key_id for key_id, _ in keys],
+        })
+        return keys
+
+    def _notify_peer(self, message: dict):
+        """Register key IDs with the peer; keys are only delivered if it accepts"""
+        req = urllib.request.Request(
+            f"{self.peer_url}/api/v1/kme/key_ids", data=json.dumps(message).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=PEER_TIMEOUT) as response:
+                response.read()
+        except OSError as e:
+            raise KMSError(f"Peer KME {self.peer_kme_id} did not accept the keys: {e}", 503)
+
+    def accept_peer_keys(self, message: dict):
+        """Claim the pool range the peer issued and hold its keys for our SAE"""
+        if message.get("master_SAE_ID") != self.peer_sae_id:
+            raise KMSError(f"Keys from unknown SAE {message.get('master_SAE_ID')}", 403)
+        key_ids = message["key_IDs"]
+        key_bytes = int(message["size"]) // 8
+        material = self.store.claim(message["pool_key"], int(message["offset"]),
+                                    len(key_ids) * key_bytes)
+        with self._lock:
+            for i, key_id in enumerate(key_ids):
+                self._pending[key_id] = material[i * key_bytes:(i + 1) * key_bytes]
+
+    def dec_keys(self, master_sae_id: str, key_ids: List[str]) -> List[dict]:
+        """Deliver keys the peer's SAE asked for; each key is handed out once"""
+        self._check_peer_sae(master_sae_id)
+        if not key_ids:
+            raise KMSError("key_ID required")
+        with self._lock:
+            missing = [key_id for key_id in key_ids if key_id not in self._pending]
+            if missing:
+                raise KMSError(f"Unknown or already delivered key_ID(s): {', '.join(missing)}")
+            keys = [(key_id, self._pending.pop(key_id)) for key_id in key_ids]
+        return [{"key_ID": key_id, "key": base64.b64encode(key).decode("ascii")}
+                for key_id, key in keys]
+
+
+def create_app(kms: KMS) -> Flask:
+    """Flask app exposing one KMS"""
+    app = Flask(__name__)
+
+    @app.errorhandler(KMSError)
+    def kms_error(e):
+        return jsonify({"message": str(e)}), e.status
+
+    @app.errorhandler(KeyStoreError)
+    def key_store_error(e):
+        return jsonify({"message": str(e)}), 409
+
+    @app.route('/api/v1/keys/<slave_sae_id>/status', methods=['GET'])
+    def status(slave_sae_id):
+        return jsonify(kms.status(slave_sae_id))
+
+    @app.route('/api/v1/keys/<slave_sae_id>/enc_keys', methods=['GET', 'POST'])
+    def enc_keys(slave_sae_id):
+        params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        try:
+            number = int(params.get('number', 1))
+            size = int(params.get('size', DEFAULT_KEY_SIZE))
+        except (TypeError, ValueError):
+            raise KMSError("number and size must be integers")
+        return jsonify({"keys": kms.enc_keys(slave_sae_id, number, size)})
+
+    @app.route('/api/v1/keys/<master_sae_id>/dec_keys', methods=['GET', 'POST'])
+    def dec_keys(master_sae_id):
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            key_ids = [entry.get('key_ID') for entry in body.get('key_IDs', [])]
+        else:
+            key_ids = request.args.getlist('key_ID')
+        return jsonify({"keys": kms.dec_keys(master_sae_id, key_ids)})
+
+    @app.route('/api/v1/kme/key_ids', methods=['POST'])
+    def peer_key_ids():
+        kms.accept_peer_keys(request.get_json())
+        return jsonify({"accepted": True})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ETSI GS QKD 014 style key delivery for BB84 keys")
+    parser.add_argument("--kme-id", required=True)
+    parser.add_argument("--sae-id", required=True, help="the application served by this KME")
+    parser.add_argument("--peer-kme-id", help="defaults to the peer URL")
+    parser.add_argument("--peer-sae-id", required=True)
+    parser.add_argument("--peer-url", required=True)
+    parser.add_argument("--key-dir", default=os.environ.get("BB84_KEY_DIR", "."))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    kms = KMS(args.kme_id, args.sae_id, args.peer_kme_id or args.peer_url, args.peer_sae_id,
+              args.peer_url, args.key_dir)
+    print(f"🔑 BB84 KMS {args.kme_id} for SAE {args.sae_id}")
+    print(f"Running on http://{args.host}:{args.port}, peer {args.peer_url}")
+    print(f"Key material: {sum(k['remaining'] for k in kms.store.info())} bytes")
+    # Retried by enc_keys if the peer is not up yet
+    kms.refill(background=True)
+    create_app(kms).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+LDPC Error Reconciliation
+One-way syndrome reconciliation with a vectorized sum-product decoder
+
+Alice splits her sifted key into frames and sends the LDPC syndrome H·x
+of each frame, plus a short hash of the frame, in a single message. Bob
+runs belief propagation on his noisy copy to find the word closest to
+it with the same syndrome, and checks the hash to confirm. Frames that
+do not decode are dropped by both sides. Unlike Cascade there is no back
+and forth, so the cost is one classical round trip per key.
+
+Parity-check matrices are kept as flat edge arrays (one entry per 1 in
+H) and every decoder step is a gather or a reduceat over those arrays,
+applied to all frames at once. Codes are built deterministically from
+their size, so Alice and Bob construct the same matrix, and are cached.
+"""
+
+import hashlib
+import numpy as np
+from functools import lru_cache
+from typing import NamedTuple
+
+# Key bits per LDPC frame
+DEFAULT_FRAME_BITS = 4096
+
+# Ones per column of H (variable node degree); weight 4 decodes clearly
+# better than 3 at the high code rates low-QBER keys need
+COLUMN_WEIGHT = 4
+
+# Rate-adaptive code family: (highest QBER, syndrome bits per key bit).
+# Each ratio is the smallest that kept the frame error rate near 1% for
+# 4096-bit frames, roughly 1.45-2.1 times the Shannon limit h(QBER)
+RATE_TABLE = (
+    (0.005, 0.10),
+    (0.01, 0.16),
+    (0.02, 0.24),
+    (0.03, 0.31),
+    (0.04, 0.38),
+    (0.06, 0.49),
+    (0.08, 0.58),
+    (0.11, 0.70),
+)
+
+# Highest QBER any code in RATE_TABLE is rated for; above it use Cascade
+MAX_LDPC_QBER = RATE_TABLE[-1][0]
+
+# QBER assumed when the sampled estimate is zero
+MIN_LDPC_QBER = 0.005
+
+DEFAULT_MAX_ITERATIONS = 60
+
+# Per-frame hash Alice sends so Bob can confirm a successful decode
+VERIFY_BITS = 32
+
+# Log-likelihood ratio used for shortened (known zero) positions
+_KNOWN_LLR = 40.0
+
+
+class LDPCCode(NamedTuple):
+    """Sparse parity-check matrix as edge arrays
+
+    Edges are sorted by check; var_order lists the same edges sorted by
+    variable, and *_starts mark where each node's edges begin.
+    """
+    num_bits: int
+    num_checks: int
+    edge_check: np.ndarray
+    edge_var: np.ndarray
+    check_starts: np.ndarray
+    var_order: np.ndarray
+    var_starts: np.ndarray
+
+
+class LDPCResult(NamedTuple):
+    """Bob's corrected key and what reconciliation disclosed
+
+    kept marks the sifted positions that survived; bits of frames that
+    failed to decode are dropped from corrected_key.
+    """
+    corrected_key: np.ndarray
+    leaked_bits: int
+    corrected_errors: int
+    failed_frames: int
+    kept: np.ndarray
+
+
+@lru_cache(maxsize=32)
+def get_code(num_bits: int, num_checks: int) -> LDPCCode:
+    """Build (or fetch) a random column-weight-4 LDPC code
+
+    Variable sockets are matched to check sockets by a permutation seeded
+    from the code size; repeated (check, variable) pairs are merged.
+    """
+    rng = np.random.default_rng([num_bits, num_checks])
+    weight = min(COLUMN_WEIGHT, num_checks)
+    var_sockets = np.repeat(np.arange(num_bits, dtype=np.int64), weight)
+    check_sockets = np.arange(len(var_sockets), dtype=np.int64) % num_checks
+    pairs = np.unique(check_sockets * num_bits + rng.permutation(var_sockets))
+
+    edge_check = pairs // num_bits
+    edge_var = pairs % num_bits
+    check_starts = np.flatnonzero(np.r_[True, edge_check[1:] != edge_check[:-1]])
+    var_order = np.argsort(edge_var, kind="stable")
+    sorted_vars = edge_var[var_order]
+    var_starts = np.flatnonzero(np.r_[True, sorted_vars[1:] != sorted_vars[:-1]])
+    return LDPCCode(num_bits, num_checks, edge_check, edge_var,
+                    check_starts, var_order, var_starts)
+
+
+def choose_code(frame_bits: int, qber: float) -> LDPCCode:
+    """Highest-rate code in RATE_TABLE rated for the estimated QBER"""
+    if qber > MAX_LDPC_QBER:
+        raise ValueError(f"No LDPC code rated for QBER {qber:.3f} (at most {MAX_LDPC_QBER})")
+    ratio = next(r for max_qber, r in RATE_TABLE if qber <= max_qber)
+    return get_code(frame_bits, max(1, int(round(frame_bits * ratio))))
+
+
+def syndrome(code: LDPCCode, frames: np.ndarray) -> np.ndarray:
+    """H·x mod 2 for every row of a (frames, num_bits) uint8 array"""
+    return np.bitwise_xor.reduceat(frames[:, code.edge_var], code.check_starts, axis=1)
+
+
+def decode(code: LDPCCode, target: np.ndarray, llr: np.ndarray,
+           max_iterations: int = DEFAULT_MAX_ITERATIONS) -> np.ndarray:
+    """Sum-product decoding of all frames towards the given syndromes
+
+    llr holds log P(0)/P(1) per bit of each frame. Frames stop iterating
+    as soon as their hard decision satisfies the syndrome.
+    """
+    decided = (llr < 0).astype(np.uint8)
+    active = np.flatnonzero(np.any(syndrome(code, decided) != target, axis=1))
+    v2c = llr[active][:, code.edge_var]
+    for _ in range(max_iterations):
+        if len(active) == 0:
+            break
+        # Check update (tanh rule), in magnitude/sign form so the
+        # extrinsic product excludes each edge without dividing
+        t = np.tanh(np.clip(v2c, -_KNOWN_LLR, _KNOWN_LLR) / 2)
+        log_mag = np.log(np.maximum(np.abs(t), 1e-300))
+        negative = (t < 0).astype(np.uint8)
+        mag_sum = np.add.reduceat(log_mag, code.check_starts, axis=1)
+        neg_sum = np.bitwise_xor.reduceat(negative, code.check_starts, axis=1)
+        extrinsic = np.minimum(np.exp(mag_sum[:, code.edge_check] - log_mag), 1 - 1e-15)
+        sign = 1.0 - 2.0 * (neg_sum[:, code.edge_check] ^ negative ^
+                            target[active][:, code.edge_check])
+        c2v = 2 * np.arctanh(extrinsic) * sign
+
+        # Variable update
+        total = llr[active] + np.add.reduceat(c2v[:, code.var_order], code.var_starts, axis=1)
+        decided[active] = total < 0
+        solved = np.all(syndrome(code, decided[active]) == target[active], axis=1)
+        v2c = (total[:, code.edge_var] - c2v)[~solved]
+        active = active[~solved]
+    return decided
+
+
+def _frame_tags(frames: np.ndarray) -> list:
+    """Short per-frame hash used to verify Bob's decode"""
+    packed = np.packbits(frames, axis=1)
+    return [hashlib.blake2b(row.tobytes(), digest_size=VERIFY_BITS // 8).digest()
+            for row in packed]
+
+
+def ldpc_reconcile(alice_key, bob_key, qber: float,
+                   frame_bits: int = DEFAULT_FRAME_BITS,
+                   max_iterations: int = DEFAULT_MAX_ITERATIONS) -> LDPCResult:
+    """Correct Bob's key towards Alice's from her frame syndromes
+
+    The code rate is picked from the QBER estimate, which must not exceed
+    MAX_LDPC_QBER (ValueError otherwise). A final partial frame
+    is shortened: both sides pad it with zeros that Bob treats as known.
+    leaked_bits counts the syndrome and verification bits of kept frames.
+    """
+    alice = np.asarray(alice_key, dtype=np.uint8)
+    bob = np.asarray(bob_key, dtype=np.uint8)
+    num_bits = len(alice)
+    if num_bits == 0:
+        return LDPCResult(bob.copy(), 0, 0, 0, np.ones(0, dtype=bool))
+
+    frame_bits = min(frame_bits, num_bits)
+    code = choose_code(frame_bits, qber)
+    num_frames = -(-num_bits // frame_bits)
+    padding = num_frames * frame_bits - num_bits
+
+    alice_frames = np.pad(alice, (0, padding)).reshape(num_frames, frame_bits)
+    bob_frames = np.pad(bob, (0, padding)).reshape(num_frames, frame_bits)
+
+    # Alice -> Bob: syndromes and verification tags, one message
+    target = syndrome(code, alice_frames)
+    tags = _frame_tags(alice_frames)
+
+    channel_llr = np.log((1 - max(qber, MIN_LDPC_QBER)) / max(qber, MIN_LDPC_QBER))
+    llr = channel_llr * (1.0 - 2.0 * bob_frames)
+    if padding:
+        llr[-1, frame_bits - padding:] = _KNOWN_LLR
+    decoded = decode(code, target, llr, max_iterations)
+
+    ok = np.array([a == b for a, b in zip(tags, _frame_tags(decoded))])
+    kept = np.repeat(ok, frame_bits)[:num_bits]
+    corrected_key = decoded.reshape(-1)[:num_bits][kept]
+    corrected_errors = int(np.count_nonzero(corrected_key != bob[kept]))
+    leaked = int(ok.sum()) * (code.num_checks + VERIFY_BITS)
+    return LDPCResult(corrected_key, leaked, corrected_errors,
+                      int(num_frames - ok.sum()), kept)
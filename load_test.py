@@ -0,0 +1,172 @@
+"""
+Encryption Service Load Test
+Request throughput and latency percentiles for the OTP API
+
+Opens a fixed number of concurrent HTTP/1.1 connections with asyncio and
+sends encrypt, decrypt or health requests back to back on each, reusing
+the connection when the server keeps it alive and reconnecting when it
+closes it. Every server URL given is measured in turn, so the Flask
+development server and the ASGI mode can be compared directly:
+
+    python quantum_encryption.py &
+    python quantum_encryption_asgi.py --workers 4 &
+    python load_test.py http://localhost:5001 http://localhost:5002
+
+Only the standard library is used, so the client itself adds little
+overhead and no extra dependencies.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+
+class LoadResult(NamedTuple):
+    """Outcome of one load run against one server"""
+    url: str
+    requests: int
+    errors: int
+    seconds: float
+    latencies: List[float]
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Latency percentile in milliseconds"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+
+def build_request(host: str, endpoint: str, message_bytes: int) -> bytes:
+    """Raw HTTP request bytes for one API call (the same bytes every time)"""
+    if endpoint == "health":
+        return (f"GET /api/health HTTP/1.1\r\nHost: {host}\r\n"
+                "Connection: keep-alive\r\n\r\n").encode("ascii")
+
+    key = os.urandom(message_bytes)
+    message = "m" * message_bytes
+    if endpoint == "encrypt":
+        path, payload = "/api/encrypt", {"message": message, "key": key.hex()}
+    else:
+        cipher = bytes(a ^ b for a, b in zip(message.encode("utf-8"), key))
+        path, payload = "/api/decrypt", {"encrypted": cipher.hex(), "key": key.hex()}
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+            "Content-Type: application/json\r\nConnection: keep-alive\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode("ascii") + body
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """(status, keep_alive) of one response, with the body consumed"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ", 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return int(status), False
+
+    connection = headers.get("connection", "")
+    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+    return int(status), keep_alive
+
+
+async def _worker(host: str, port: int, request: bytes, deadline: float,
+                  remaining: List[int], latencies: List[float], errors: List[int]):
+    """One client connection sending requests until time or budget runs out"""
+    reader = writer = None
+    while remaining[0] > 0 and time.perf_counter() < deadline:
+        remaining[0] -= 1
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors[0] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors[0] += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url: str, endpoint: str = "encrypt", concurrency: int = 32,
+                   total_requests: int = 5000, duration: Optional[float] = None,
+                   message_bytes: int = 32) -> LoadResult:
+    """Drive one server with concurrent keep-alive connections"""
+    parts = urlsplit(url)
+    host, port = parts.hostname or "localhost", parts.port or 80
+    request = build_request(f"{host}:{port}", endpoint, message_bytes)
+    latencies: List[float] = []
+    errors = [0]
+    remaining = [total_requests if duration is None else float("inf")]
+
+    start = time.perf_counter()
+    deadline = start + (duration if duration is not None else float("inf"))
+    await asyncio.gather(*(_worker(host, port, request, deadline, remaining, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return LoadResult(url, len(latencies), errors[0], elapsed, latencies)
+
+
+def print_results(results: List[LoadResult]):
+    print(f"{'server':<28} {'requests':>9} {'errors':>7} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for r in results:
+        print(f"{r.url:<28} {r.requests:>9} {r.errors:>7} {r.throughput:>9.0f} "
+              f"{r.percentile(50):>8.2f} {r.percentile(99):>8.2f} {r.percentile(100):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the OTP encryption API")
+    parser.add_argument("urls", nargs="*", default=["http://localhost:5001", "http://localhost:5002"],
+                        help="server base URLs, measured one after another")
+    parser.add_argument("--endpoint", choices=("encrypt", "decrypt", "health"), default="encrypt")
+    parser.add_argument("--concurrency", type=int, default=32, help="open connections")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per server")
+    parser.add_argument("--duration", type=float, help="seconds per server instead of a request count")
+    parser.add_argument("--message-bytes", type=int, default=32, help="plaintext size per request")
+    args = parser.parse_args()
+
+    results = []
+    for url in args.urls:
+        print(f"Loading {url} ({args.endpoint}, {args.concurrency} connections)...")
+        results.append(asyncio.run(run_load(url, args.endpoint, args.concurrency,
+                                            args.requests, args.duration, args.message_bytes)))
+    print()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
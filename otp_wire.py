@@ -0,0 +1,85 @@
+"""
+OTP Wire Formats
+Binary request and response bodies for the encryption API
+
+JSON with hex strings doubles every ciphertext and key on the wire. The
+encrypt/decrypt routes also accept two binary formats, chosen by the
+request Content-Type; the response uses the format named in Accept, or
+the request's own format:
+
+    application/octet-stream  the body is the raw payload; the key comes
+                              from headers (X-OTP-Key hex, or X-OTP-Key-Id
+                              and X-OTP-Key-Offset), and the response
+                              carries X-Key-Id / X-Key-Offset
+    application/x-otp-frame   one self-describing frame (below)
+
+Frame layout, big-endian:
+
+    version      u8    FRAME_VERSION
+    key_id_len   u8    0 when the key is inline
+    offset       u64   first key byte used
+    key_len      u32   inline key bytes (0 in responses)
+    payload_len  u32
+    key_id, key, payload
+"""
+
+import struct
+from typing import NamedTuple, Optional
+
+JSON_TYPE = "application/json"
+OCTET_STREAM = "application/octet-stream"
+FRAME_TYPE = "application/x-otp-frame"
+BINARY_TYPES = (OCTET_STREAM, FRAME_TYPE)
+
+FRAME_VERSION = 1
+_HEADER = struct.Struct(">BBQII")
+
+
+class Frame(NamedTuple):
+    """Decoded frame: a payload and the key (inline or stored) it pairs with"""
+    key_id: str
+    offset: int
+    key: bytes
+    payload: bytes
+
+
+def encode_frame(payload: bytes, key_id: str = "", offset: int = 0, key: bytes = b"") -> bytes:
+    """Serialize a frame"""
+    key_id_bytes = key_id.encode("utf-8")
+    if len(key_id_bytes) > 255:
+        raise ValueError("Key ID longer than 255 bytes")
+    header = _HEADER.pack(FRAME_VERSION, len(key_id_bytes), offset, len(key), len(payload))
+    return b"".join((header, key_id_bytes, key, payload))
+
+
+def decode_frame(data: bytes) -> Frame:
+    """Parse a frame, checking the version and that the lengths add up"""
+    if len(data) < _HEADER.size:
+        raise ValueError("Frame shorter than its header")
+    version, key_id_len, offset, key_len, payload_len = _HEADER.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    if _HEADER.size + key_id_len + key_len + payload_len != len(data):
+        raise ValueError("Frame length does not match its header")
+
+    view = memoryview(data)
+    start = _HEADER.size
+    key_id = bytes(view[start:start + key_id_len]).decode("utf-8")
+    start += key_id_len
+    key = bytes(view[start:start + key_len])
+    start += key_len
+    return Frame(key_id, offset, key, bytes(view[start:]))
+
+
+def mimetype(content_type: Optional[str]) -> str:
+    """Media type without parameters, lowercased"""
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def response_type(accept: Optional[str], request_type: str) -> str:
+    """Binary format to answer in: the first binary type in Accept, else the request's"""
+    for media_range in (accept or "").split(","):
+        media_type = mimetype(media_range)
+        if media_type in BINARY_TYPES:
+            return media_type
+    return request_type
@@ -0,0 +1,151 @@
+"""
+Packed Qubit Storage
+Compact one-bit-per-qubit container for bits and bases
+
+PackedBits keeps a sequence of 0/1 values in a NumPy uint8 buffer, eight
+qubits per byte (most significant bit first, the same order as
+np.packbits). The buffer is padded to a whole number of 64-bit words so
+bulk operations can work on it as uint64 without copying. A 100M-qubit
+attribute takes 12.5 MB instead of the ~800 MB of a Python int list.
+"""
+
+import numpy as np
+from typing import Iterable, List, Optional, Union
+
+
+def _padded_buffer(num_bits: int) -> np.ndarray:
+    """Zeroed byte buffer for num_bits, rounded up to whole uint64 words"""
+    num_words = (num_bits + 63) // 64
+    return np.zeros(num_words * 8, dtype=np.uint8)
+
+
+class PackedBits:
+    """Immutable bit sequence stored one bit per element in a packed buffer"""
+
+    __slots__ = ("_buf", "_len")
+
+    def __init__(self, buffer=None, length: int = 0):
+        if buffer is None:
+            buffer = _padded_buffer(0)
+        buffer = np.asarray(buffer, dtype=np.uint8)
+        if len(buffer) * 8 < length:
+            raise ValueError(f"Buffer holds {len(buffer) * 8} bits, need {length}")
+        if len(buffer) % 8:
+            padded = _padded_buffer(length)
+            usable = min(len(buffer), len(padded))
+            padded[:usable] = buffer[:usable]
+            buffer = padded
+        self._buf = buffer
+        self._len = length
+
+    # Construction
+
+    @classmethod
+    def from_array(cls, bits) -> "PackedBits":
+        """Pack an array or list of 0/1 values"""
+        bits = np.asarray(bits, dtype=np.uint8)
+        buf = _padded_buffer(len(bits))
+        packed = np.packbits(bits)
+        buf[:len(packed)] = packed
+        return cls(buf, len(bits))
+
+    from_list = from_array
+
+    @classmethod
+    def from_bytes(cls, data: bytes, length: Optional[int] = None) -> "PackedBits":
+        """Wrap already-packed bytes (MSB first) holding length bits"""
+        if length is None:
+            length = len(data) * 8
+        buf = _padded_buffer(length)
+        raw = np.frombuffer(data, dtype=np.uint8)[:len(buf)]
+        buf[:len(raw)] = raw
+        # Clear stray bits past the end so word-level operations stay exact
+        if length % 8:
+            buf[length // 8] &= (0xFF << (8 - length % 8)) & 0xFF
+        return cls(buf, length)
+
+    # Access
+
+    @property
+    def packed(self) -> np.ndarray:
+        """Underlying uint8 buffer, padded to whole 64-bit words"""
+        return self._buf
+
+    @property
+    def words(self) -> np.ndarray:
+        """Zero-copy uint64 view of the buffer for bitwise word operations"""
+        return self._buf.view(np.uint64)
+
+    @property
+    def nbytes(self) -> int:
+        return self._buf.nbytes
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return PackedBits.from_array(self.to_array()[start:stop:step])
+            return self._slice(start, max(start, stop))
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("PackedBits index out of range")
+        return int((self._buf[index >> 3] >> (7 - (index & 7))) & 1)
+
+    def _slice(self, start: int, stop: int) -> "PackedBits":
+        """Contiguous slice; byte-aligned starts are copied without unpacking"""
+        first_byte, last_byte = start >> 3, (stop + 7) >> 3
+        if start & 7 == 0:
+            return PackedBits.from_bytes(self._buf[first_byte:last_byte].tobytes(), stop - start)
+        bits = np.unpackbits(self._buf[first_byte:last_byte])
+        offset = start & 7
+        return PackedBits.from_array(bits[offset:offset + stop - start])
+
+    def take(self, indices) -> np.ndarray:
+        """Gather the bits at the given positions as a uint8 array"""
+        indices = np.asarray(indices, dtype=np.int64)
+        shifts = (7 - (indices & 7)).astype(np.uint8)
+        return (self._buf[indices >> 3] >> shifts) & 1
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PackedBits):
+            return self._len == other._len and np.array_equal(self._buf, other._buf)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        preview = "".join(str(b) for b in self[:16])
+        more = "..." if self._len > 16 else ""
+        return f"PackedBits({self._len} bits: {preview}{more})"
+
+    def count(self) -> int:
+        """Number of 1 bits"""
+        return int(np.unpackbits(self._buf).sum(dtype=np.int64))
+
+    # Conversion
+
+    def to_array(self) -> np.ndarray:
+        """Unpacked uint8 array, one element per bit"""
+        return np.unpackbits(self._buf, count=self._len)
+
+    def __array__(self, dtype=None, copy=None):
+        bits = self.to_array()
+        return bits if dtype is None else bits.astype(dtype)
+
+    def tolist(self) -> List[int]:
+        """Python int list for display code"""
+        return self.to_array().tolist()
+
+    def to_bytes(self) -> bytes:
+        """Packed bytes without the word padding"""
+        return self._buf[:(self._len + 7) // 8].tobytes()
+
+
+def as_packed(bits: Union["PackedBits", Iterable[int]]) -> PackedBits:
+    """Accept either a PackedBits or any sequence of 0/1 values"""
+    return bits if isinstance(bits, PackedBits) else PackedBits.from_array(bits)
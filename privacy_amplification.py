@@ -0,0 +1,116 @@
+"""
+Privacy Amplification
+Toeplitz (two-universal) hashing of the reconciled key
+
+The reconciled key x (n bits) is multiplied over GF(2) by a random
+m x n Toeplitz matrix T, built from n + m - 1 public seed bits. Because T
+is constant along its diagonals, T·x is a slice of the linear convolution
+of the seed with x, so it is computed with FFTs in O(n log n) instead of
+the O(n·m) matrix product. The output length m is chosen from the
+estimated error rate and the bits leaked during reconciliation.
+"""
+
+import hashlib
+import math
+import os
+import numpy as np
+from typing import Optional
+
+from bit_utils import pack_bits
+
+# Bits subtracted from the secure length as a finite-size security margin
+DEFAULT_SECURITY_BITS = 64
+
+# Reconciliation efficiency assumed when the leaked bit count is unknown
+DEFAULT_EC_EFFICIENCY = 1.2
+
+# Below this many secure bits the apps fall back to the 256-bit SHA-256
+# digest they have always produced, so small demo runs still get a key
+MIN_TOEPLITZ_BITS = 256
+
+
+def binary_entropy(p: float) -> float:
+    """h(p) = -p log2 p - (1-p) log2 (1-p)"""
+    if p <= 0.0 or p >= 1.0:
+        return 0.0
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+
+
+def secure_key_length(num_bits: int, qber: float, leaked_bits: Optional[int] = None,
+                      security_bits: int = DEFAULT_SECURITY_BITS) -> int:
+    """Number of output bits Eve has no information about
+
+    Eve's knowledge is bounded by n·h(qber) for BB84; leaked_bits is what
+    reconciliation disclosed (estimated from the efficiency when unknown).
+    """
+    if leaked_bits is None:
+        leaked_bits = math.ceil(DEFAULT_EC_EFFICIENCY * num_bits * binary_entropy(qber))
+    length = num_bits * (1 - binary_entropy(qber)) - leaked_bits - 2 * security_bits
+    return max(0, int(length))
+
+
+def toeplitz_seed_bits(seed: bytes, count: int) -> np.ndarray:
+    """Expand a short public seed into the Toeplitz diagonal bits"""
+    stream = hashlib.shake_256(seed).digest((count + 7) // 8)
+    return np.unpackbits(np.frombuffer(stream, dtype=np.uint8), count=count)
+
+
+def _fast_fft_length(n: int) -> int:
+    """Smallest 2^a·3^b·5^c >= n (sizes NumPy's FFT handles fastest)"""
+    best = 1 << (n - 1).bit_length()
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            candidate = power35
+            while candidate < n:
+                candidate *= 2
+            best = min(best, candidate)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def toeplitz_hash(bits, output_bits: int, seed: bytes) -> np.ndarray:
+    """Compute T·x over GF(2) for the Toeplitz matrix defined by seed
+
+    Returns output_bits bits as a uint8 array.
+    """
+    x = np.asarray(bits, dtype=np.uint8)
+    n = len(x)
+    if output_bits <= 0 or n == 0:
+        return np.zeros(max(0, output_bits), dtype=np.uint8)
+
+    diagonals = toeplitz_seed_bits(seed, n + output_bits - 1)
+    # (T·x)[i] = sum_j t[i - j + n - 1]·x[j], i.e. entries n-1 .. n+m-2 of the
+    # convolution t * x. A circular convolution of length >= n + m - 1 only
+    # wraps into the first n-1 entries, which are not needed.
+    size = _fast_fft_length(n + output_bits - 1)
+    spectrum = np.fft.rfft(diagonals.astype(np.float64), size) * np.fft.rfft(x.astype(np.float64), size)
+    conv = np.fft.irfft(spectrum, size)[n - 1:n - 1 + output_bits]
+    return (np.rint(conv).astype(np.int64) & 1).astype(np.uint8)
+
+
+def privacy_amplify(bits, output_bits: int, seed: Optional[bytes] = None) -> bytes:
+    """Toeplitz-hash bits down to output_bits and return the packed key"""
+    if seed is None:
+        seed = os.urandom(32)
+    return pack_bits(toeplitz_hash(bits, output_bits, seed))
+
+
+def derive_final_key(bits, error_rate: float = 0.0, output_bits: Optional[int] = None,
+                     leaked_bits: Optional[int] = None, seed: Optional[bytes] = None) -> str:
+    """Final key as hex, Toeplitz-compressed to the secure length
+
+    output_bits defaults to secure_key_length(). When fewer than
+    MIN_TOEPLITZ_BITS secure bits are available the key is the SHA-256
+    digest of the bits, as before.
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    if output_bits is None:
+        output_bits = secure_key_length(len(bits), error_rate, leaked_bits)
+    if output_bits < MIN_TOEPLITZ_BITS:
+        return hashlib.sha256(pack_bits(bits)).hexdigest()
+    # Whole bytes keep the hex key aligned with the OTP service
+    output_bits -= output_bits % 8
+    return privacy_amplify(bits, output_bits, seed).hex()
@@ -9,11 +9,9 @@ HOW TO RUN:
    OR: python3 quantum-keygen-gui.py
    OR: Just double-click this file (on Windows)
 
-No additional packages required - uses built-in tkinter!
+Uses built-in tkinter; the simulation engine needs NumPy (pip install numpy)
 """
 
-import random
-import hashlib
 import time
 import threading
 import tkinter as tk
@@ -21,6 +19,11 @@ from tkinter import ttk, messagebox, scrolledtext, filedialog
 from typing import List, Tuple
 import os
 
+from bb84_engine import prepare_qubits, transmit_qubits, measure_qubits, sift_packed
+from bb84_qber import sample_qber
+from cascade_reconciliation import cascade_reconcile
+from privacy_amplification import derive_final_key
+
 class BB84SplitGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -40,6 +43,9 @@ class BB84SplitGUI:
         self.alice_bases = []
         self.bob_bases = []
         self.bob_results = []
+        self.transmitted_bits = []
+        self.error_rate = 0.0
+        self.leaked_bits = None
         self.final_key = ""
         self.current_phase = "setup"
         self.bob_ready = False
@@ -421,23 +427,17 @@ class BB84SplitGUI:
         self.alice_data.insert(tk.END, f"\n🎭 Alice preparing {self.num_qubits} qubits...\n\n")
         
         def prepare():
-            self.alice_bits = []
-            self.alice_bases = []
+            # Simplified manual - use random for now
+            bits, bases = prepare_qubits(self.num_qubits)
+            self.alice_bits = bits.tolist()
+            self.alice_bases = bases.tolist()
             
             # Show progress differently based on qubit count
             show_every = max(1, self.num_qubits // 20)  # Show every nth qubit for large counts
             
             for i in range(self.num_qubits):
-                if method == "random":
-                    bit = random.randint(0, 1)
-                    basis = random.randint(0, 1)
-                else:
-                    # Simplified manual - use random for now
-                    bit = random.randint(0, 1)
-                    basis = random.randint(0, 1)
-                
-                self.alice_bits.append(bit)
-                self.alice_bases.append(basis)
+                bit = self.alice_bits[i]
+                basis = self.alice_bases[i]
                 
                 # Only show every nth qubit to avoid overwhelming the display
                 if i % show_every == 0 or i < 10:
@@ -482,12 +482,13 @@ class BB84SplitGUI:
             self.eve_activity.insert(tk.END, "👁️ EVE EAVESDROPPING!\n\n")
         
         def transmit():
+            transmitted, intercepted = transmit_qubits(
+                self.alice_bits, self.alice_bases, self.has_eavesdropper)
+            self.transmitted_bits = transmitted.tolist()
+            
             for i in range(self.num_qubits):
-                if self.has_eavesdropper and random.random() < 0.6:
+                if intercepted[i]:
                     # Eve interferes
-                    if random.random() < 0.5:  # Wrong basis 50% of time
-                        self.alice_bits[i] = random.randint(0, 1)
-                    
                     if i < 10:  # Show first 10 interceptions
                         self.eve_activity.insert(tk.END, f"Q{i+1}: Intercepted! 🔍\n")
                         self.eve_activity.see(tk.END)
@@ -521,26 +522,15 @@ class BB84SplitGUI:
         self.bob_data.insert(tk.END, f"🔬 Bob measuring {self.num_qubits} qubits...\n\n")
         
         def measure():
-            self.bob_bases = []
-            self.bob_results = []
+            # Manual strategy is simplified to random
+            bob_bases, bob_results = measure_qubits(self.alice_bases, self.transmitted_bits)
+            self.bob_bases = bob_bases.tolist()
+            self.bob_results = bob_results.tolist()
             
             for i in range(self.num_qubits):
-                if method == "random":
-                    bob_basis = random.randint(0, 1)
-                else:
-                    bob_basis = random.randint(0, 1)  # Simplified
-                
-                self.bob_bases.append(bob_basis)
-                
-                # Simulate measurement result
-                if self.alice_bases[i] == bob_basis:
-                    result = self.alice_bits[i]
-                    match = "✓"
-                else:
-                    result = random.randint(0, 1)
-                    match = "✗"
-                
-                self.bob_results.append(result)
+                bob_basis = self.bob_bases[i]
+                result = self.bob_results[i]
+                match = "✓" if self.alice_bases[i] == bob_basis else "✗"
                 
                 basis_symbol = '+' if bob_basis == 0 else '×'
                 self.bob_data.insert(tk.END, 
@@ -569,23 +559,20 @@ class BB84SplitGUI:
             sift_text += f"{'Q':<3} {'A_basis':<7} {'B_basis':<7} {'Match':<6} {'Keep'}\n"
             sift_text += "-" * 35 + "\n"
             
-            matching_indices = []
+            sifted_bits, matching_indices = sift_packed(
+                self.alice_bases, self.bob_bases, self.bob_results)
+            self.sifted_bits = sifted_bits.tolist()
+            matching_indices = matching_indices.tolist()
+            matched = set(matching_indices)
             
             for i in range(self.num_qubits):
-                match = self.alice_bases[i] == self.bob_bases[i]
+                match = i in matched
                 alice_symbol = '+' if self.alice_bases[i] == 0 else '×'
                 bob_symbol = '+' if self.bob_bases[i] == 0 else '×'
-                
-                if match:
-                    matching_indices.append(i)
-                    keep = "✓ YES"
-                else:
-                    keep = "✗ NO"
+                keep = "✓ YES" if match else "✗ NO"
                 
                 sift_text += f"{i+1:<3} {alice_symbol:<7} {bob_symbol:<7} {'✓' if match else '✗':<6} {keep}\n"
             
-            self.sifted_bits = [self.bob_results[i] for i in matching_indices]
-            
             sift_text += f"\nMatching bases: {len(matching_indices)}/{self.num_qubits}\n"
             sift_text += f"Sifted key bits: {self.sifted_bits}\n"
             
@@ -605,57 +592,30 @@ class BB84SplitGUI:
             error_text = f"\n{'='*15} ERROR CHECKING {'='*15}\n"
             
             if len(self.sifted_bits) >= 4:
-                # Compare ALL qubits instead of just a sample
+                # Compare a random sample of the sifted bits
                 total_bits = len(self.sifted_bits)
+                estimate = sample_qber(self.alice_bits, self.sifted_bits, self.matching_indices)
+                errors = estimate.errors
+                error_rate = estimate.error_rate
+                self.error_rate = error_rate
                 
-                error_text += f"Comparing ALL {total_bits} sifted bits:\n\n"
+                error_text += f"Comparing {estimate.sample_size} randomly chosen of {total_bits} sifted bits:\n\n"
                 
-                errors = 0
-                show_limit = min(20, total_bits)  # Show first 20 for display purposes
-                
-                # Check all bits but only display first 20
-                for idx in range(total_bits):
+                show_limit = min(20, estimate.sample_size)  # Show first 20 for display purposes
+                for idx in estimate.sampled_positions[:show_limit]:
                     alice_bit = self.alice_bits[self.matching_indices[idx]]
                     bob_bit = self.sifted_bits[idx]
                     match = alice_bit == bob_bit
-                    
-                    if not match:
-                        errors += 1
-                    
-                    # Only show first 20 in the display to avoid overwhelming the GUI
-                    if idx < show_limit:
-                        error_text += f"Bit {idx+1:3d}: A={alice_bit}, B={bob_bit} {'✓' if match else '✗'}\n"
-                
-                # Show summary if there are more bits than displayed
-                if total_bits > show_limit:
-                    remaining_bits = total_bits - show_limit
-                    remaining_errors = errors - sum(1 for i in range(show_limit) 
-                                                  if self.alice_bits[self.matching_indices[i]] != self.sifted_bits[i])
-                    error_text += f"... and {remaining_bits} more bits "
-                    if remaining_errors > 0:
-                        error_text += f"({remaining_errors} additional errors)\n"
-                    else:
-                        error_text += f"(all matching)\n"
-                
-                # Add eavesdropper errors if enabled
-                if self.has_eavesdropper and errors == 0:
-                    # Force some errors if eavesdropper is present but no natural errors occurred
-                    additional_errors = random.randint(1, min(5, max(1, total_bits // 10)))
-                    errors += additional_errors
-                    error_text += f"\n⚠️ Eavesdropper interference added {additional_errors} errors!\n"
-                elif self.has_eavesdropper:
-                    # Add some additional errors due to eavesdropper
-                    additional_errors = random.randint(0, min(3, max(1, total_bits // 20)))
-                    errors += additional_errors
-                    if additional_errors > 0:
-                        error_text += f"\n⚠️ Eavesdropper interference added {additional_errors} more errors!\n"
+                    error_text += f"Bit {idx+1:3d}: A={alice_bit}, B={bob_bit} {'✓' if match else '✗'}\n"
                 
-                error_rate = errors / total_bits
+                if estimate.sample_size > show_limit:
+                    error_text += f"... and {estimate.sample_size - show_limit} more sampled bits\n"
                 
-                error_text += f"\n📊 COMPLETE ERROR ANALYSIS:\n"
-                error_text += f"Total sifted bits: {total_bits}\n"
-                error_text += f"Total errors found: {errors}\n"
+                error_text += f"\n📊 ERROR ANALYSIS:\n"
+                error_text += f"Bits compared: {estimate.sample_size}\n"
+                error_text += f"Errors found: {errors}\n"
                 error_text += f"Quantum Bit Error Rate (QBER): {error_rate:.3f} ({error_rate*100:.1f}%)\n"
+                error_text += f"95% confidence interval: {estimate.ci_low:.3f} - {estimate.ci_high:.3f}\n"
                 
                 # Security assessment
                 if error_rate > 0.15:
@@ -676,14 +636,19 @@ class BB84SplitGUI:
                         error_text += "⚠️ Eve was present but got lucky with low error rate\n"
                         error_text += "This can happen by chance in quantum systems\n"
                 
-                # Remove a portion of bits that were "publicly compared" for error checking
-                # In real BB84, these bits would be discarded
-                sacrifice_count = min(errors + 2, len(self.sifted_bits) // 4)  # Sacrifice some bits
-                if sacrifice_count > 0:
-                    # Remove sacrificed bits from the end
-                    self.sifted_bits = self.sifted_bits[:-sacrifice_count]
-                    error_text += f"\n🗑️ Sacrificed {sacrifice_count} bits for error checking\n"
-                    error_text += f"Remaining bits for final key: {len(self.sifted_bits)}\n"
+                # The compared bits were revealed publicly, so discard exactly those
+                self.sifted_bits = estimate.discard(self.sifted_bits).tolist()
+                self.matching_indices = estimate.discard(self.matching_indices).tolist()
+                error_text += f"\n🗑️ Sacrificed {estimate.sample_size} compared bits\n"
+                error_text += f"Remaining bits for final key: {len(self.sifted_bits)}\n"
+                
+                # Cascade reconciliation fixes Bob's remaining errors
+                alice_key = [self.alice_bits[i] for i in self.matching_indices]
+                result = cascade_reconcile(alice_key, self.sifted_bits, error_rate)
+                self.sifted_bits = result.corrected_key.tolist()
+                self.leaked_bits = result.leaked_bits
+                error_text += f"\n🔧 Cascade corrected {result.corrected_errors} errors "
+                error_text += f"({result.leaked_bits} parity bits disclosed)\n"
                 
             else:
                 error_text += "❌ Not enough bits for comprehensive error checking\n"
@@ -705,13 +670,8 @@ class BB84SplitGUI:
             messagebox.showerror("Error", "Not enough bits for key generation!")
             return
         
-        # Privacy amplification
-        bit_string = ''.join(str(b) for b in self.sifted_bits)
-        while len(bit_string) % 8 != 0:
-            bit_string += '0'
-        
-        byte_data = bytes(int(bit_string[i:i+8], 2) for i in range(0, len(bit_string), 8))
-        self.final_key = hashlib.sha256(byte_data).hexdigest()
+        # Privacy amplification (Toeplitz hashing to the secure length)
+        self.final_key = derive_final_key(self.sifted_bits, self.error_rate, leaked_bits=self.leaked_bits)
         
         final_text = f"\n{'='*15} FINAL KEY {'='*15}\n"
         final_text += f"🔑 SHARED SECRET KEY:\n"
@@ -742,6 +702,8 @@ class BB84SplitGUI:
         self.alice_bases = []
         self.bob_bases = []
         self.bob_results = []
+        self.transmitted_bits = []
+        self.error_rate = 0.0
         self.final_key = ""
         self.bob_ready = False
         
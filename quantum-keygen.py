@@ -3,12 +3,16 @@ Interactive BB84 Quantum Key Generator for Terminal
 Perfect for live demonstrations with audience participation!
 """
 
-import random
-import hashlib
 import time
 import sys
 import os
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+from bb84_engine import prepare_qubits, transmit_qubits, measure_qubits, sift_packed, random_bits
+from bb84_qber import sample_qber
+from cascade_reconciliation import cascade_reconcile
+from privacy_amplification import derive_final_key
+from key_store import write_key_file
 
 class InteractiveBB84Generator:
     def __init__(self):
@@ -138,12 +142,11 @@ class InteractiveBB84Generator:
                 
         elif choice == 2:  # Random all
             print(f"\n🎲 Random preparation of {num_qubits} qubits...")
-            for i in range(num_qubits):
-                alice_bits.append(random.randint(0, 1))
-                alice_bases.append(random.randint(0, 1))
-                if i < 5:  # Show first 5
-                    print(f"Qubit {i+1}: Bit={alice_bits[-1]}, Basis={'+' if alice_bases[-1]==0 else '×'}")
-                    time.sleep(0.2)
+            bits, bases = prepare_qubits(num_qubits)
+            alice_bits, alice_bases = bits.tolist(), bases.tolist()
+            for i in range(min(5, num_qubits)):  # Show first 5
+                print(f"Qubit {i+1}: Bit={alice_bits[i]}, Basis={'+' if alice_bases[i]==0 else '×'}")
+                time.sleep(0.2)
             if num_qubits > 5:
                 print(f"... and {num_qubits-5} more qubits randomly prepared")
             time.sleep(1)
@@ -163,9 +166,9 @@ class InteractiveBB84Generator:
             
             if num_qubits > manual_count:
                 print(f"\n🎲 Random preparation of remaining {num_qubits-manual_count} qubits...")
-                for i in range(manual_count, num_qubits):
-                    alice_bits.append(random.randint(0, 1))
-                    alice_bases.append(random.randint(0, 1))
+                bits, bases = prepare_qubits(num_qubits - manual_count)
+                alice_bits.extend(bits.tolist())
+                alice_bases.extend(bases.tolist())
                 time.sleep(1)
         
         print(f"\n✅ Alice has prepared all {num_qubits} qubits!")
@@ -186,35 +189,14 @@ class InteractiveBB84Generator:
             time.sleep(2)
             
             # Eve's interception
-            intercepted_bits = []
-            intercepted_bases = []
-            eve_bases = []
-            
             print("\nEve's attack process:")
-            for i in range(num_qubits):
-                if random.random() < 0.6:  # 60% chance Eve intercepts
-                    eve_basis = random.randint(0, 1)
-                    eve_bases.append(eve_basis)
-                    
-                    # Eve measures
-                    if alice_bases[i] == eve_basis:
-                        intercepted_bit = alice_bits[i]
-                    else:
-                        intercepted_bit = random.randint(0, 1)
-                    
-                    intercepted_bits.append(intercepted_bit)
-                    intercepted_bases.append(eve_basis)
-                else:
-                    # Not intercepted
-                    intercepted_bits.append(alice_bits[i])
-                    intercepted_bases.append(alice_bases[i])
+            received_bits, intercepted = transmit_qubits(alice_bits, alice_bases, True)
+            received_bits = received_bits.tolist()
             
-            print(f"📊 Eve intercepted {len(eve_bases)}/{num_qubits} qubits!")
+            print(f"📊 Eve intercepted {int(intercepted.sum())}/{num_qubits} qubits!")
             print(f"   This will introduce errors that Alice and Bob can detect!")
-            
-            alice_bits = intercepted_bits
-            alice_bases = intercepted_bases
         else:
+            received_bits = list(alice_bits)
             print("\n✅ Secure transmission! No eavesdropper detected.")
         
         self.press_enter()
@@ -251,10 +233,10 @@ class InteractiveBB84Generator:
                 
                 # Simulate measurement
                 if alice_bases[i] == bob_basis:
-                    result = alice_bits[i]
+                    result = received_bits[i]
                     print(f"  Result: {result} ✓ (Correct! Same basis as Alice)")
                 else:
-                    result = random.randint(0, 1)
+                    result = int(random_bits(1)[0])
                     print(f"  Result: {result} ✗ (Random! Different basis)")
                 
                 bob_results.append(result)
@@ -262,22 +244,14 @@ class InteractiveBB84Generator:
                 
         elif choice == 2:  # Random measurement
             print(f"\n🎲 Random measurement of {num_qubits} qubits...")
-            for i in range(num_qubits):
-                bob_basis = random.randint(0, 1)
-                bob_bases.append(bob_basis)
-                
-                if alice_bases[i] == bob_basis:
-                    result = alice_bits[i]
-                else:
-                    result = random.randint(0, 1)
-                
-                bob_results.append(result)
-                
-                if i < 5:  # Show first 5
-                    match = "✓" if alice_bases[i] == bob_basis else "✗"
-                    print(f"Qubit {i+1}: Basis={'+' if bob_basis==0 else '×'}, "
-                          f"Result={result} {match}")
-                    time.sleep(0.2)
+            bases, results = measure_qubits(alice_bases, received_bits)
+            bob_bases, bob_results = bases.tolist(), results.tolist()
+            
+            for i in range(min(5, num_qubits)):  # Show first 5
+                match = "✓" if alice_bases[i] == bob_bases[i] else "✗"
+                print(f"Qubit {i+1}: Basis={'+' if bob_bases[i]==0 else '×'}, "
+                      f"Result={bob_results[i]} {match}")
+                time.sleep(0.2)
             
             if num_qubits > 5:
                 print(f"... and {num_qubits-5} more qubits measured randomly")
@@ -285,25 +259,16 @@ class InteractiveBB84Generator:
         else:  # Smart measurement (try to match)
             print(f"\n🧠 Smart measurement - trying to guess Alice's bases...")
             # In reality, Bob doesn't know Alice's bases, but for demo
-            for i in range(num_qubits):
-                # Bob guesses randomly (as in real protocol)
-                bob_basis = random.randint(0, 1)
-                bob_bases.append(bob_basis)
-                
-                if alice_bases[i] == bob_basis:
-                    result = alice_bits[i]
-                    match = "✓"
-                else:
-                    result = random.randint(0, 1)
-                    match = "✗"
-                
-                bob_results.append(result)
-                
-                if i < 5:
-                    print(f"Qubit {i+1}: Bob chose {'+' if bob_basis==0 else '×'}, "
-                          f"Alice used {'+' if alice_bases[i]==0 else '×'}, "
-                          f"Result={result} {match}")
-                    time.sleep(0.2)
+            # Bob guesses randomly (as in real protocol)
+            bases, results = measure_qubits(alice_bases, received_bits)
+            bob_bases, bob_results = bases.tolist(), results.tolist()
+            
+            for i in range(min(5, num_qubits)):
+                match = "✓" if alice_bases[i] == bob_bases[i] else "✗"
+                print(f"Qubit {i+1}: Bob chose {'+' if bob_bases[i]==0 else '×'}, "
+                      f"Alice used {'+' if alice_bases[i]==0 else '×'}, "
+                      f"Result={bob_results[i]} {match}")
+                time.sleep(0.2)
         
         print(f"\n✅ Bob has measured all qubits!")
         print(f"Bob's sample bases: {['+' if b==0 else '×' for b in bob_bases[:10]]}")
@@ -325,14 +290,13 @@ class InteractiveBB84Generator:
         print(f"{'Qubit':<8} {'Alice':<10} {'Bob':<10} {'Match?':<10} {'Keep?'}")
         print("-" * 60)
         
-        matching_indices = []
-        matches_displayed = 0
+        sifted_bits, matching_indices = sift_packed(alice_bases, bob_bases, bob_results)
+        sifted_bits, matching_indices = sifted_bits.tolist(), matching_indices.tolist()
         
-        for i in range(num_qubits):
+        for i in range(min(16, num_qubits)):
             match = alice_bases[i] == bob_bases[i]
             
             if match:
-                matching_indices.append(i)
                 symbol = "✓ YES"
                 keep = "✓ KEEP"
             else:
@@ -349,8 +313,6 @@ class InteractiveBB84Generator:
             elif i == 15 and num_qubits > 15:
                 print(f"... and {num_qubits-15} more qubits")
         
-        sifted_bits = [bob_results[i] for i in matching_indices]
-        
         print(f"\n📊 SIFTING RESULTS:")
         print(f"Total qubits sent: {num_qubits}")
         print(f"Matching bases: {len(matching_indices)}")
@@ -372,41 +334,35 @@ class InteractiveBB84Generator:
         print("High error rate = Possible eavesdropper!")
         
         if len(sifted_bits) >= 10:
-            sample_size = min(10, len(sifted_bits) // 2)
-            sample_indices = random.sample(range(len(sifted_bits)), sample_size)
+            estimate = sample_qber(alice_bits, sifted_bits, matching_indices,
+                                   sample_size=min(10, len(sifted_bits) // 2))
+            sample_size = estimate.sample_size
             
             print(f"\n📊 Comparing {sample_size} randomly chosen bits:")
             print("-" * 50)
             
-            errors = 0
-            for count, idx in enumerate(sample_indices, 1):
+            for count, idx in enumerate(estimate.sampled_positions, 1):
                 alice_bit = alice_bits[matching_indices[idx]]
                 bob_bit = sifted_bits[idx]
-                match = alice_bit == bob_bit
                 
-                if match:
+                if alice_bit == bob_bit:
                     print(f"Bit {count}: Alice={alice_bit}, Bob={bob_bit} ✓ MATCH")
                 else:
                     print(f"Bit {count}: Alice={alice_bit}, Bob={bob_bit} ✗ ERROR")
-                    errors += 1
                 time.sleep(0.5)
             
-            # If we simulated eavesdropper, add more errors
-            if has_eavesdropper:
-                additional_errors = random.randint(2, min(4, sample_size - errors))
-                errors += additional_errors
-                print(f"\n⚠️  Eavesdropper introduced {additional_errors} additional errors!")
-            
-            error_rate = errors / sample_size
+            errors = estimate.errors
+            error_rate = estimate.error_rate
             
             print(f"\n📈 ERROR STATISTICS:")
             print(f"Bits compared: {sample_size}")
             print(f"Errors found: {errors}")
             print(f"Quantum Bit Error Rate (QBER): {error_rate:.1%}")
+            print(f"95% confidence interval: {estimate.ci_low:.1%} - {estimate.ci_high:.1%}")
             
             # Remove the compared bits (they're no longer secret)
-            remaining_indices = [i for i in range(len(sifted_bits)) if i not in sample_indices]
-            sifted_bits = [sifted_bits[i] for i in remaining_indices]
+            sifted_bits = estimate.discard(sifted_bits).tolist()
+            alice_key = estimate.discard([alice_bits[i] for i in matching_indices])
             
             print(f"\n🔐 SECURITY ASSESSMENT:")
             if error_rate > 0.15:
@@ -432,10 +388,19 @@ class InteractiveBB84Generator:
             if error_rate > 0.3:
                 print("\n❌ Error rate too high! Key generation failed.")
                 return None
+            
+            # Cascade: fix Bob's remaining errors by comparing block parities
+            result = cascade_reconcile(alice_key, sifted_bits, error_rate)
+            sifted_bits = result.corrected_key.tolist()
+            leaked_bits = result.leaked_bits
+            print(f"\n🔧 ERROR RECONCILIATION (Cascade):")
+            print(f"Errors corrected: {result.corrected_errors}")
+            print(f"Parity bits disclosed: {leaked_bits}")
                 
         else:
             print("⚠️  Not enough bits for error checking")
             error_rate = 0.0
+            leaked_bits = None
         
         self.press_enter()
         
@@ -452,7 +417,7 @@ class InteractiveBB84Generator:
         print(f"\nInitial sifted bits: {len(sifted_bits)} bits")
         
         # Generate final key using hash
-        final_key_hex = self._privacy_amplification(sifted_bits)
+        final_key_hex = self._privacy_amplification(sifted_bits, error_rate, leaked_bits)
         
         print(f"\n✅ FINAL KEY GENERATED!")
         print(f"Key length: {len(final_key_hex)} hex characters")
@@ -486,41 +451,24 @@ class InteractiveBB84Generator:
         # Save to file option
         save = input("\n💾 Save key to file? (y/n): ").lower() == 'y'
         if save:
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"bb84_key_{timestamp}.txt"
-            with open(filename, 'w') as f:
-                f.write("=" * 60 + "\n")
-                f.write("BB84 Quantum Key Generation Results\n")
-                f.write("=" * 60 + "\n\n")
-                f.write(f"Generated: {time.ctime()}\n")
-                f.write(f"Qubits sent: {num_qubits}\n")
-                f.write(f"Matching bases: {len(matching_indices)}\n")
-                f.write(f"Error rate: {error_rate:.1%}\n")
-                f.write(f"Eavesdropper simulated: {'YES' if has_eavesdropper else 'NO'}\n")
-                f.write(f"Security status: {'COMPROMISED' if error_rate > 0.15 else 'SECURE'}\n\n")
-                f.write("FINAL KEY (hex):\n")
-                f.write("=" * 60 + "\n")
-                f.write(final_key_hex + "\n")
-                f.write("=" * 60 + "\n")
+            # Same report format the encryption server's key store loads
+            filename = write_key_file(final_key_hex, os.environ.get("BB84_KEY_DIR", "."), {
+                "Qubits sent": num_qubits,
+                "Matching bases": len(matching_indices),
+                "Error rate": f"{error_rate:.1%}",
+                "Eavesdropper simulated": 'YES' if has_eavesdropper else 'NO',
+                "Security status": 'COMPROMISED' if error_rate > 0.15 else 'SECURE',
+            })
             print(f"✅ Key saved to {filename}")
+            print("   The encryption server can use it as key_id="
+                  f"{os.path.splitext(os.path.basename(filename))[0]}")
         
         return final_key_hex
     
-    def _privacy_amplification(self, bits: List[int]) -> str:
-        """Convert bits to secure key using SHA-256"""
-        bit_string = ''.join(str(b) for b in bits)
-        
-        # Pad to multiple of 8
-        while len(bit_string) % 8 != 0:
-            bit_string += '0'
-        
-        # Convert to bytes
-        byte_data = bytes(int(bit_string[i:i+8], 2) 
-                         for i in range(0, len(bit_string), 8))
-        
-        # Use hash for privacy amplification
-        hash_obj = hashlib.sha256(byte_data)
-        return hash_obj.hexdigest()
+    def _privacy_amplification(self, bits: List[int], error_rate: float = 0.0,
+                               leaked_bits: Optional[int] = None) -> str:
+        """Compress bits to a secure key with Toeplitz hashing"""
+        return derive_final_key(bits, error_rate, leaked_bits=leaked_bits)
     
     # def run_quick_mode(self) -> str:
     #     """Quick mode for testing"""
@@ -127,111 +127,589 @@
 #     print("  GET  /api/health  - Health check")
 #     app.run(host='0.0.0.0', port=5001, debug=True)
 
+import io
+import os
+import json
 import random
 import hashlib
-from flask import Flask, request, jsonify
+import tempfile
+import time
+from flask import Flask, Request, Response, g, request, jsonify
 from flask_cors import CORS
 
+from bit_utils import xor_bytes
+from key_store import KeyStore, KeyStoreError
+from keystream import XOF_SEED_BYTES, new_nonce, xof_keystream
+from service_metrics import Metrics
+from wegman_carter import AUTH_KEY_BYTES, otp_open, otp_seal
+from otp_wire import BINARY_TYPES, FRAME_TYPE, Frame, decode_frame, encode_frame, mimetype, response_type
+
+class StreamingRequest(Request):
+    """Request that spools every upload to a real temporary file
+
+    Flask closes uploads when the view returns, before a streamed response
+    is sent; an OS-level file can be duplicated to outlive that.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return tempfile.TemporaryFile("w+b")
+
 app = Flask(__name__)
+app.request_class = StreamingRequest
 CORS(app)
 
-@app.route('/api/encrypt', methods=['POST'])
-def encrypt():
-    data = request.json
+# Keys deposited by BB84 runs (bb84_key_*.txt reports or POST /api/keys);
+# encryption consumes each key's bytes in order, never twice
+key_store = KeyStore(os.environ.get("BB84_KEY_DIR", "."))
+key_store.load_key_files()
+
+# Per-route request counts, latency and payload histograms for /api/metrics
+metrics = Metrics()
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    """Observe the request once its body has been sent (streams included)"""
+    start = g.get('request_start', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    size = request.content_length or 0
+    error = response.status_code >= 400 or g.get('api_error', False)
+    response.call_on_close(lambda: metrics.observe(route, time.perf_counter() - start, size, error))
+    return response
+
+def api_json(payload):
+    """jsonify that also flags "success": false results as errors for the metrics"""
+    if payload.get("success") is False:
+        g.api_error = True
+    return jsonify(payload)
+
+# Bytes read, XORed and sent per step by the streaming endpoints
+STREAM_CHUNK_BYTES = 1 << 20
+
+def key_too_short(needed_bytes, have_bytes):
+    """Error text used when the pad is shorter than the data"""
+    return f"Key too short! Need {needed_bytes * 8} bits, have {have_bytes * 8} bits"
+
+def otp_xor(data, key_bytes):
+    """One-time pad: XOR the data with the start of the key, byte buffers at a time"""
+    return xor_bytes(data, key_bytes)
+
+def message_pad(data, length, consume):
+    """Pad for one JSON request and the fields that identify it
+
+    mode "otp" (default) uses length key bytes directly; mode "xof"
+    expands the key (or XOF_SEED_BYTES of a stored key) with a nonce into
+    a SHAKE-256 keystream. consume=True reserves stored-key bytes for
+    encryption, else the issued range at offset is read back. length
+    includes the AUTH_KEY_BYTES of an authenticated message.
+    """
+    mode = data.get('mode', 'otp')
+    if mode not in ('otp', 'xof'):
+        raise ValueError(f"Unknown mode {mode!r}, expected 'otp' or 'xof'")
+    key_id = data.get('key_id', '')
+    needed = XOF_SEED_BYTES if mode == 'xof' else length
+    details = {}
+
+    if key_id and consume:
+        # Stored key: take the next unused bytes, never reused
+        reservation = key_store.reserve(key_id, needed)
+        key_bytes = reservation.key_bytes
+        details.update(key_id=key_id, offset=reservation.offset)
+    elif key_id:
+        key_bytes = key_store.read(key_id, int(data.get('offset', 0)), needed)
+    else:
+        key_bytes = bytes.fromhex(data.get('key', ''))
+
+    if mode == 'xof':
+        if data.get('nonce'):
+            nonce = bytes.fromhex(data['nonce'])
+        elif consume:
+            nonce = new_nonce()
+        else:
+            raise ValueError("Nonce required to decrypt keystream mode")
+        key_bytes = xof_keystream(key_bytes, nonce, length)
+        details.update(mode='xof', nonce=nonce.hex())
+    return key_bytes, details
+
+def encrypt_message(data):
+    """Result of /api/encrypt for a parsed JSON body (shared with the ASGI app)"""
     message = data.get('message', '')
     key = data.get('key', '')
+    key_id = data.get('key_id', '')
     
-    if not message or not key:
-        return jsonify({"success": False, "error": "Message and key required"})
+    if not message or not (key or key_id):
+        return {"success": False, "error": "Message and key required"}
     
     try:
-        # Simple OTP encryption
-        key_bytes = bytes.fromhex(key)
-        key_bits = []
-        for byte in key_bytes:
-            key_bits.extend([(byte >> i) & 1 for i in range(7, -1, -1)])
-        
+        # Simple OTP encryption; "auth" also takes a one-time MAC key
+        # from the pad right after the message bytes
         message_bytes = message.encode('utf-8')
-        message_bits = []
-        for byte in message_bytes:
-            message_bits.extend([(byte >> i) & 1 for i in range(7, -1, -1)])
+        auth = bool(data.get('auth'))
+        needed = len(message_bytes) + (AUTH_KEY_BYTES if auth else 0)
+        key_bytes, details = message_pad(data, needed, consume=True)
         
-        if len(key_bits) < len(message_bits):
-            return jsonify({
+        if len(key_bytes) < needed:
+            return {
                 "success": False,
-                "error": f"Key too short! Need {len(message_bits)} bits, have {len(key_bits)} bits"
-            })
+                "error": key_too_short(needed, len(key_bytes))
+            }
         
-        # XOR encryption
-        cipher_bits = []
-        for m_bit, k_bit in zip(message_bits, key_bits):
-            cipher_bits.append(m_bit ^ k_bit)
+        # XOR encryption, tagged in the same pass when authenticated
+        if auth:
+            cipher_bytes, tag = otp_seal(message_bytes, key_bytes, key_bytes[len(message_bytes):needed])
+            details['tag'] = tag.hex()
+        else:
+            cipher_bytes = otp_xor(message_bytes, key_bytes)
         
-        cipher_string = ''.join(str(b) for b in cipher_bits)
-        cipher_bytes = bytes(int(cipher_string[i:i+8], 2) 
-                           for i in range(0, len(cipher_string), 8))
-        
-        return jsonify({
+        result = {
             "success": True,
             "encrypted_hex": cipher_bytes.hex(),
             "message_length": len(message),
-            "bits_encrypted": len(message_bits)
-        })
+            "bits_encrypted": len(message_bytes) * 8
+        }
+        result.update(details)
+        return result
         
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)})
+        return {"success": False, "error": str(e)}
 
-@app.route('/api/decrypt', methods=['POST'])
-def decrypt():
-    data = request.json
+def decrypt_message(data):
+    """Result of /api/decrypt for a parsed JSON body (shared with the ASGI app)"""
     encrypted = data.get('encrypted', '')
     key = data.get('key', '')
+    key_id = data.get('key_id', '')
     
-    if not encrypted or not key:
-        return jsonify({"success": False, "error": "Encrypted text and key required"})
+    if not encrypted or not (key or key_id):
+        return {"success": False, "error": "Encrypted text and key required"}
     
     try:
         # Simple OTP decryption (same as encryption)
-        key_bytes = bytes.fromhex(key)
-        key_bits = []
-        for byte in key_bytes:
-            key_bits.extend([(byte >> i) & 1 for i in range(7, -1, -1)])
-        
         cipher_bytes = bytes.fromhex(encrypted)
-        cipher_bits = []
-        for byte in cipher_bytes:
-            cipher_bits.extend([(byte >> i) & 1 for i in range(7, -1, -1)])
+        tag = data.get('tag', '')
+        if data.get('auth') and not tag:
+            return {"success": False, "error": "Authentication tag required"}
+        needed = len(cipher_bytes) + (AUTH_KEY_BYTES if tag else 0)
+        key_bytes, _ = message_pad(data, needed, consume=False)
         
-        if len(key_bits) < len(cipher_bits):
-            return jsonify({
+        if len(key_bytes) < needed:
+            return {
                 "success": False,
-                "error": f"Key too short! Need {len(cipher_bits)} bits, have {len(key_bits)} bits"
-            })
-        
-        # XOR decryption
-        plain_bits = []
-        for c_bit, k_bit in zip(cipher_bits, key_bits):
-            plain_bits.append(c_bit ^ k_bit)
+                "error": key_too_short(needed, len(key_bytes))
+            }
         
-        plain_string = ''.join(str(b) for b in plain_bits)
-        plain_bytes = bytes(int(plain_string[i:i+8], 2) 
-                          for i in range(0, len(plain_string), 8))
+        # XOR decryption; with a tag, no plaintext is released unless it verifies
+        if tag:
+            plain_bytes = otp_open(cipher_bytes, key_bytes, key_bytes[len(cipher_bytes):needed],
+                                   bytes.fromhex(tag))
+            if plain_bytes is None:
+                return {"success": False, "error": "Authentication failed: ciphertext or tag was modified"}
+        else:
+            plain_bytes = otp_xor(cipher_bytes, key_bytes)
         
         decrypted_message = plain_bytes.decode('utf-8')
         
-        return jsonify({
+        return {
             "success": True,
             "decrypted_message": decrypted_message
+        }
+        
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def jsonify_bytes(payload):
+    """Compact JSON body for responses built outside a Flask view"""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode('utf-8') + b"\n"
+
+def binary_otp(body, headers, consume):
+    """Encrypt (consume=True) or decrypt a binary request (see otp_wire)
+
+    headers maps lowercased header names to values. Returns (status,
+    content type, body, extra headers); errors come back as JSON with 400.
+    """
+    request_type = mimetype(headers.get('content-type'))
+    try:
+        if request_type == FRAME_TYPE:
+            frame = decode_frame(body)
+        else:
+            frame = Frame(headers.get('x-otp-key-id', ''), int(headers.get('x-otp-key-offset') or 0),
+                          bytes.fromhex(headers.get('x-otp-key', '')), body)
+
+        if not frame.payload or not (frame.key or frame.key_id):
+            raise ValueError("Payload and key required")
+        if frame.key_id and consume:
+            # Stored key: take the next unused bytes, never reused
+            reservation = key_store.reserve(frame.key_id, len(frame.payload))
+            key_bytes, offset = reservation.key_bytes, reservation.offset
+        elif frame.key_id:
+            key_bytes, offset = key_store.read(frame.key_id, frame.offset, len(frame.payload)), frame.offset
+        else:
+            key_bytes, offset = frame.key[frame.offset:], frame.offset
+
+        if len(key_bytes) < len(frame.payload):
+            raise ValueError(key_too_short(len(frame.payload), len(key_bytes)))
+        output = otp_xor(frame.payload, key_bytes)
+    except ValueError as e:
+        return 400, 'application/json', jsonify_bytes({"success": False, "error": str(e)}), {}
+
+    out_type = response_type(headers.get('accept'), request_type)
+    extra = {"X-Key-Id": frame.key_id, "X-Key-Offset": str(offset)} if frame.key_id else {}
+    if out_type == FRAME_TYPE:
+        output = encode_frame(output, frame.key_id, offset)
+    return 200, out_type, output, extra
+
+def _binary_view(consume):
+    status, content_type, body, extra = binary_otp(
+        request.get_data(), {k.lower(): v for k, v in request.headers.items()}, consume)
+    return Response(body, status=status, content_type=content_type, headers=extra)
+
+@app.route('/api/encrypt', methods=['POST'])
+def encrypt():
+    if request.mimetype in BINARY_TYPES:
+        return _binary_view(consume=True)
+    return api_json(encrypt_message(request.json))
+
+@app.route('/api/decrypt', methods=['POST'])
+def decrypt():
+    if request.mimetype in BINARY_TYPES:
+        return _binary_view(consume=False)
+    return api_json(decrypt_message(request.json))
+
+def _batch_offsets(items, field, start):
+    """(payload, key offset) per batch item
+
+    Items are bare payloads or {field: payload, "offset": n}. Items without
+    an offset use the key bytes right after the previous item, so a batch
+    consumes the pad sequentially unless told otherwise.
+    """
+    pairs = []
+    offset = start
+    for item in items:
+        if isinstance(item, dict):
+            payload = item.get(field, '')
+            offset = item.get('offset', offset)
+        else:
+            payload = item
+        pairs.append((payload, offset))
+        offset += len(payload.encode('utf-8')) if field == 'message' else len(payload) // 2
+    return pairs
+
+def _batch_payload(item, field):
+    """Batch item without its offset (stored keys assign offsets themselves)"""
+    return item.get(field, '') if isinstance(item, dict) else item
+
+def otp_batch(payloads, offsets, key_bytes):
+    """XOR many payloads against their key ranges in one pass
+
+    Returns one entry per payload: the XORed bytes, or an error string when
+    its key range runs past the end of the key.
+    """
+    results = [None] * len(payloads)
+    fits = []
+    for i, (payload, offset) in enumerate(zip(payloads, offsets)):
+        if offset < 0 or offset + len(payload) > len(key_bytes):
+            results[i] = key_too_short(offset + len(payload), len(key_bytes))
+        else:
+            fits.append(i)
+
+    # Concatenate the payloads and their key ranges, XOR once, split again
+    data = b''.join(payloads[i] for i in fits)
+    pad = b''.join(key_bytes[offsets[i]:offsets[i] + len(payloads[i])] for i in fits)
+    xored = memoryview(otp_xor(data, pad))
+    position = 0
+    for i in fits:
+        results[i] = bytes(xored[position:position + len(payloads[i])])
+        position += len(payloads[i])
+    return results
+
+@app.route('/api/encrypt/batch', methods=['POST'])
+def encrypt_batch():
+    """Encrypt many messages with one key decode and one XOR"""
+    data = request.json
+    key = data.get('key', '')
+    key_id = data.get('key_id', '')
+    messages = data.get('messages', [])
+    
+    if not messages or not (key or key_id):
+        return api_json({"success": False, "error": "Messages and key required"})
+    
+    try:
+        if key_id:
+            # Stored key: one reservation covers the whole batch, in order
+            pairs = _batch_offsets([_batch_payload(m, 'message') for m in messages], 'message', 0)
+            payloads = [message.encode('utf-8') for message, _ in pairs]
+            reservation = key_store.reserve(key_id, sum(len(p) for p in payloads))
+            key_bytes, base = reservation.key_bytes, reservation.offset
+        else:
+            key_bytes, base = bytes.fromhex(key), 0
+            pairs = _batch_offsets(messages, 'message', data.get('offset', 0))
+            payloads = [message.encode('utf-8') for message, _ in pairs]
+        offsets = [offset for _, offset in pairs]
+        
+        results = []
+        for (message, offset), payload, cipher in zip(pairs, payloads, otp_batch(payloads, offsets, key_bytes)):
+            offset += base
+            if not message:
+                results.append({"success": False, "error": "Message required", "offset": offset})
+            elif isinstance(cipher, str):
+                results.append({"success": False, "error": cipher, "offset": offset})
+            else:
+                results.append({
+                    "success": True,
+                    "encrypted_hex": cipher.hex(),
+                    "offset": offset,
+                    "message_length": len(message),
+                    "bits_encrypted": len(payload) * 8
+                })
+        
+        return api_json({
+            "success": True,
+            "results": results,
+            # First key byte not used by any encrypted message
+            "next_offset": max((r["offset"] + r["bits_encrypted"] // 8 for r in results if r["success"]),
+                               default=data.get('offset', 0)),
+            **({"key_id": key_id} if key_id else {})
         })
         
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)})
+        return api_json({"success": False, "error": str(e)})
+
+@app.route('/api/decrypt/batch', methods=['POST'])
+def decrypt_batch():
+    """Decrypt many ciphertexts with one key decode and one XOR"""
+    data = request.json
+    key = data.get('key', '')
+    key_id = data.get('key_id', '')
+    messages = data.get('messages', [])
+    
+    if not messages or not (key or key_id):
+        return api_json({"success": False, "error": "Messages and key required"})
+    
+    try:
+        pairs = _batch_offsets(messages, 'encrypted', data.get('offset', 0))
+        base = 0
+        if key_id:
+            # Read the issued span covering every item once
+            base = min(offset for _, offset in pairs)
+            end = max(offset + len(encrypted) // 2 for encrypted, offset in pairs)
+            key_bytes = key_store.read(key_id, base, end - base)
+        else:
+            key_bytes = bytes.fromhex(key)
+        
+        results = [None] * len(pairs)
+        payloads, offsets, positions = [], [], []
+        for i, (encrypted, offset) in enumerate(pairs):
+            try:
+                payloads.append(bytes.fromhex(encrypted))
+                offsets.append(offset - base)
+                positions.append(i)
+            except ValueError as e:
+                results[i] = {"success": False, "error": str(e), "offset": offset}
+        
+        for i, plain in zip(positions, otp_batch(payloads, offsets, key_bytes)):
+            offset = pairs[i][1]
+            if not pairs[i][0]:
+                results[i] = {"success": False, "error": "Encrypted text required", "offset": offset}
+            elif isinstance(plain, str):
+                results[i] = {"success": False, "error": plain, "offset": offset}
+            else:
+                try:
+                    results[i] = {"success": True, "decrypted_message": plain.decode('utf-8'),
+                                  "offset": offset}
+                except UnicodeDecodeError as e:
+                    results[i] = {"success": False, "error": str(e), "offset": offset}
+        
+        return api_json({"success": True, "results": results})
+        
+    except Exception as e:
+        return api_json({"success": False, "error": str(e)})
+
+def otp_stream(read_data, read_key, chunk_size=STREAM_CHUNK_BYTES):
+    """Yield the OTP of a byte stream chunk by chunk
+
+    read_data and read_key are file-like read(n) callables, so memory use
+    is one chunk of data and key whatever the total size. Raises
+    ValueError if the key runs out before the data.
+    """
+    done = 0
+    while True:
+        chunk = read_data(chunk_size)
+        if not chunk:
+            break
+        key_chunk = read_key(len(chunk))
+        if len(key_chunk) < len(chunk):
+            raise ValueError(key_too_short(done + len(chunk), done + len(key_chunk)))
+        yield otp_xor(chunk, key_chunk)
+        done += len(chunk)
+
+def _detach_upload(upload):
+    """Private handle on an uploaded file that survives the request's cleanup"""
+    upload.stream.seek(0)
+    return os.fdopen(os.dup(upload.stream.fileno()), 'rb')
+
+def _stream_size(stream):
+    """Remaining bytes of a seekable upload, or None"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END) - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def _request_value(name, header):
+    """Parameter from the form, the query string or a header"""
+    return request.form.get(name) or request.args.get(name) or request.headers.get(header, '')
+
+def _stream_key(data_size, consume):
+    """Key stream for a streaming request, plus response headers
+
+    A stored key (key_id) needs the payload size up front: encryption
+    reserves that many bytes, decryption reads the issued range at offset.
+    Otherwise the key is a multipart file part "key" holding the raw pad,
+    or a hex key from the form, query string or X-OTP-Key header.
+    """
+    key_id = _request_value('key_id', 'X-OTP-Key-Id')
+    if key_id:
+        if data_size is None:
+            raise KeyStoreError("Stored keys need a known payload size (Content-Length or a file upload)")
+        if consume:
+            reservation = key_store.reserve(key_id, data_size)
+            offset, key_bytes = reservation.offset, reservation.key_bytes
+        else:
+            offset = int(_request_value('offset', 'X-OTP-Key-Offset') or 0)
+            key_bytes = key_store.read(key_id, offset, data_size)
+        return io.BytesIO(key_bytes), len(key_bytes), {"X-Key-Id": key_id, "X-Key-Offset": str(offset)}
+
+    if 'key' in request.files:
+        key = _detach_upload(request.files['key'])
+        return key, _stream_size(key), {}
+    key_bytes = bytes.fromhex(_request_value('key', 'X-OTP-Key'))
+    return io.BytesIO(key_bytes), len(key_bytes), {}
+
+def _stream_sources(consume):
+    """Data and key streams for a streaming request
+
+    Data: a multipart file part "file", else the raw request body
+    (octet-stream or chunked). See _stream_key for the key.
+    """
+    if 'file' in request.files:
+        data = _detach_upload(request.files['file'])
+        data_size = _stream_size(data)
+    else:
+        data = request.stream
+        data_size = request.content_length
+
+    try:
+        key, key_size, headers = _stream_key(data_size, consume)
+    except ValueError:
+        if data is not request.stream:
+            data.close()
+        raise
+    return data, data_size, key, key_size, headers
+
+def _stream_otp_response(filename, consume):
+    """Shared body of the streaming encrypt/decrypt routes"""
+    try:
+        data, data_size, key, key_size, headers = _stream_sources(consume)
+    except ValueError as e:
+        return api_json({"success": False, "error": str(e)}), 400
+    # Our own handles on the uploads, closed once the response is sent
+    handles = [f for f in (data, key) if f is not request.stream]
+
+    error = None
+    if not key_size:
+        error = "Key required"
+    # Refuse up front whenever both sizes are known; chunked bodies are
+    # checked as they stream and the response is cut short on failure
+    elif data_size is not None and key_size is not None and key_size < data_size:
+        error = key_too_short(data_size, key_size)
+    if error:
+        for handle in handles:
+            handle.close()
+        return api_json({"success": False, "error": error}), 400
+
+    def body():
+        try:
+            yield from otp_stream(data.read, key.read)
+        finally:
+            for handle in handles:
+                handle.close()
+
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    if data_size is not None:
+        headers["Content-Length"] = str(data_size)
+    return Response(body(), mimetype='application/octet-stream', headers=headers)
+
+@app.route('/api/encrypt/stream', methods=['POST'])
+def encrypt_stream():
+    """Streaming OTP encryption of a file or raw body, binary in and out"""
+    return _stream_otp_response("encrypted.bin", consume=True)
+
+@app.route('/api/decrypt/stream', methods=['POST'])
+def decrypt_stream():
+    """Streaming OTP decryption (the same XOR as encryption)"""
+    return _stream_otp_response("decrypted.bin", consume=False)
+
+@app.route('/api/keys', methods=['POST'])
+def deposit_key():
+    """Deposit a BB84 key into the store and return its ID"""
+    data = request.json
+    key = data.get('key', '')
+    
+    if not key:
+        return api_json({"success": False, "error": "Key required"})
+    
+    try:
+        key_bytes = bytes.fromhex(key)
+        key_id = key_store.deposit(key_bytes, data.get('key_id'))
+        return api_json({"success": True, "key_id": key_id, "bytes": len(key_bytes)})
+    except Exception as e:
+        return api_json({"success": False, "error": str(e)})
+
+@app.route('/api/keys', methods=['GET'])
+def list_keys():
+    """Stored keys with their used and remaining bytes (no key material)"""
+    return api_json({"success": True, "keys": key_store.info()})
+
+@app.route('/api/keys/reload', methods=['POST'])
+def reload_keys():
+    """Pick up bb84_key_*.txt reports saved since startup"""
+    return api_json({"success": True, "added": key_store.load_key_files()})
+
+HEALTH_STATUS = {"status": "healthy", "service": "Quantum Encryption"}
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request metrics plus key-store totals in Prometheus text format"""
+    keys = key_store.info()
+    extra = [
+        ("key_bytes_consumed_total", "counter", "Stored-key bytes reserved for encryption",
+         sum(k["used"] for k in keys)),
+        ("key_bytes_remaining", "gauge", "Unused bytes across stored keys",
+         sum(k["remaining"] for k in keys)),
+    ]
+    return Response(metrics.render(extra), content_type='text/plain; version=0.0.4')
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({"status": "healthy", "service": "Quantum Encryption"})
+    return jsonify(HEALTH_STATUS)
 
 if __name__ == '__main__':
     print("🔐 Quantum Encryption Service")
     print("Running on http://localhost:5001")
+    print("Endpoints:")
+    print("  POST /api/encrypt         - Encrypt message with OTP (or mode=xof keystream, auth=true tag)")
+    print("  POST /api/decrypt         - Decrypt message with OTP")
+    print("                              (JSON, application/octet-stream or application/x-otp-frame)")
+    print("  POST /api/encrypt/batch   - Encrypt many messages in one request")
+    print("  POST /api/decrypt/batch   - Decrypt many messages in one request")
+    print("  POST /api/encrypt/stream  - Stream a file or raw body through the OTP")
+    print("  POST /api/decrypt/stream  - Stream ciphertext back to plaintext")
+    print("  POST /api/keys            - Deposit a key, get a key_id for encrypt/decrypt")
+    print("  GET  /api/keys            - List stored keys and remaining bytes")
+    print("  GET  /api/metrics         - Prometheus metrics")
+    print("  GET  /api/health          - Health check")
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
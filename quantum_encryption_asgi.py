@@ -0,0 +1,193 @@
+"""
+Quantum Encryption Service (ASGI)
+Async serving mode for the OTP encryption API
+
+Serves the same /api/encrypt, /api/decrypt and /api/health contract as
+quantum_encryption.py (same request fields, same JSON responses, CORS
+open to all origins) as a plain ASGI application, so it runs under an
+ASGI server with an event loop per worker process instead of Flask's
+single-process development server. The server keeps HTTP/1.1
+connections alive, and a slow client only holds its own connection.
+
+The encrypt/decrypt logic is shared with the Flask app. Small requests
+with a raw key are pure CPU work taking microseconds and run inline on
+the event loop. Anything that may resolve a stored key_id touches the
+key store's locked, fsynced state file and runs in a thread, so file
+I/O never blocks the loop: JSON bodies with key_id, octet-stream bodies
+with X-OTP-Key-Id, and every framed body (its key ID is inside the
+frame). Bodies over a MiB also go to a thread. The binary wire formats
+of otp_wire are negotiated the same way as in Flask.
+
+    python quantum_encryption_asgi.py --workers 4
+    uvicorn quantum_encryption_asgi:app --port 5002 --workers 4
+
+load_test.py compares this server with the Flask one.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+from otp_wire import BINARY_TYPES, FRAME_TYPE, mimetype
+from quantum_encryption import HEALTH_STATUS, binary_otp, encrypt_message, decrypt_message, jsonify_bytes
+
+DEFAULT_PORT = 5002
+
+# Largest JSON body accepted; bigger payloads belong on the streaming routes
+MAX_BODY_BYTES = 16 << 20
+
+# Binary bodies at least this large are XORed in a thread
+INLINE_BODY_BYTES = 1 << 20
+
+CORS_HEADERS = [(b"access-control-allow-origin", b"*")]
+
+# path: (method, JSON handler, whether binary requests consume key bytes)
+ROUTES = {
+    "/api/encrypt": ("POST", encrypt_message, True),
+    "/api/decrypt": ("POST", decrypt_message, False),
+    "/api/health": ("GET", None, False),
+}
+
+
+async def _send(send, status: int, body: bytes, headers=(), content_type=b"application/json"):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    *CORS_HEADERS, *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, status: int, message: str):
+    await _send(send, status, jsonify_bytes({"success": False, "error": message}))
+
+
+async def _read_body(receive) -> bytes:
+    """Whole request body; None if it exceeds MAX_BODY_BYTES"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b""
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _preflight(scope, send):
+    """Answer a CORS preflight the way flask-cors does"""
+    headers = dict(scope["headers"])
+    allow = [(b"access-control-allow-methods", b"GET, POST, OPTIONS")]
+    if b"access-control-request-headers" in headers:
+        allow.append((b"access-control-allow-headers", headers[b"access-control-request-headers"]))
+    await _send(send, 200, b"", allow)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = ROUTES.get(scope["path"])
+    if route is None:
+        await _error(send, 404, "Not found")
+        return
+    method, handler, consume = route
+    if scope["method"] == "OPTIONS":
+        await _preflight(scope, send)
+        return
+    if scope["method"] != method:
+        await _error(send, 405, "Method not allowed")
+        return
+    if handler is None:
+        await _send(send, 200, jsonify_bytes(HEALTH_STATUS))
+        return
+
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+               for name, value in scope["headers"]}
+
+    body = await _read_body(receive)
+    if body is None:
+        await _error(send, 413, f"Request body over {MAX_BODY_BYTES} bytes")
+        return
+    if mimetype(headers.get("content-type")) in BINARY_TYPES:
+        await _send_binary(send, body, headers, consume)
+        return
+    try:
+        data = json.loads(body)
+    except ValueError:
+        await _error(send, 400, "Request body must be JSON")
+        return
+    if not isinstance(data, dict):
+        await _error(send, 400, "Request body must be a JSON object")
+        return
+
+    if data.get("key_id"):
+        result = await asyncio.to_thread(handler, data)
+    else:
+        result = handler(data)
+    await _send(send, 200, jsonify_bytes(result))
+
+
+async def _send_binary(send, body: bytes, headers: dict, consume: bool):
+    """Answer an octet-stream or framed request"""
+    if (mimetype(headers.get("content-type")) == FRAME_TYPE or "x-otp-key-id" in headers
+            or len(body) >= INLINE_BODY_BYTES):
+        response = await asyncio.to_thread(binary_otp, body, headers, consume)
+    else:
+        response = binary_otp(body, headers, consume)
+    status, content_type, output, extra = response
+    await _send(send, status, output,
+                [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in extra.items()],
+                content_type.encode("latin-1"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the OTP encryption API over ASGI")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, each with its own event loop")
+    parser.add_argument("--keep-alive", type=int, default=5,
+                        help="seconds an idle connection stays open")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The ASGI mode needs uvicorn: pip install uvicorn")
+
+    print("🔐 Quantum Encryption Service (ASGI)")
+    print(f"Running on http://localhost:{args.port} with {args.workers} worker(s)")
+    print("Endpoints:")
+    print("  POST /api/encrypt  - Encrypt message with OTP")
+    print("  POST /api/decrypt  - Decrypt message with OTP")
+    print("  GET  /api/health   - Health check")
+    uvicorn.run("quantum_encryption_asgi:app", host=args.host, port=args.port,
+                workers=args.workers, timeout_keep_alive=args.keep_alive,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
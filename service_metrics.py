@@ -0,0 +1,140 @@
+"""
+Service Metrics
+Request counters and histograms for the encryption service, in Prometheus text format
+
+Every thread records into its own shard (plain lists and dicts reached
+through a threading.local), so recording takes no lock and never
+contends; a scrape sums the shards. Shards are registered once per
+thread, the only time a lock is taken. When a thread ends its shard is
+folded into one retired total, so a server that starts a thread per
+connection keeps one shard per live thread, not per connection served.
+Histograms use fixed bucket bounds and a bisect, so one request costs a
+few list updates.
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Request latency bucket bounds, seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Request payload bucket bounds, bytes
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1 << 20, 4 << 20, 16 << 20, 64 << 20)
+
+
+class _RouteStats:
+    """One thread's counters for one route"""
+    __slots__ = ("requests", "errors", "latency", "latency_sum", "size", "size_sum")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.size = [0] * (len(SIZE_BUCKETS) + 1)
+        self.size_sum = 0
+
+    def add(self, other: "_RouteStats"):
+        """Add another set of counters into this one"""
+        self.requests += other.requests
+        self.errors += other.errors
+        self.latency = [a + b for a, b in zip(self.latency, other.latency)]
+        self.latency_sum += other.latency_sum
+        self.size = [a + b for a, b in zip(self.size, other.size)]
+        self.size_sum += other.size_sum
+
+
+class Metrics:
+    """Per-thread sharded request metrics"""
+
+    def __init__(self, prefix: str = "otp"):
+        self.prefix = prefix
+        self._local = threading.local()
+        self._shards: List[Dict[str, _RouteStats]] = []
+        # Everything recorded by threads that have ended
+        self._retired: Dict[str, _RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def _route_stats(self, route: str) -> _RouteStats:
+        """This thread's stats for a route, registering the shard on first use"""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+        stats = shard[route] = _RouteStats()
+        return stats
+
+    def observe(self, route: str, seconds: float, payload_bytes: int, error: bool = False):
+        """Record one finished request"""
+        try:
+            stats = self._local.shard[route]
+        except (AttributeError, KeyError):
+            stats = self._route_stats(route)
+        stats.requests += 1
+        stats.errors += error
+        stats.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.latency_sum += seconds
+        stats.size[bisect_left(SIZE_BUCKETS, payload_bytes)] += 1
+        stats.size_sum += payload_bytes
+
+    def _retire(self, shard: Dict[str, _RouteStats]):
+        """Fold a finished thread's shard into the retired totals"""
+        with self._lock:
+            self._shards.remove(shard)
+            for route, stats in shard.items():
+                self._retired.setdefault(route, _RouteStats()).add(stats)
+
+    def _totals(self) -> Dict[str, _RouteStats]:
+        """Retired totals plus every live shard, per route"""
+        totals: Dict[str, _RouteStats] = {}
+        with self._lock:
+            shards = list(self._shards)
+            for route, stats in self._retired.items():
+                totals.setdefault(route, _RouteStats()).add(stats)
+        for shard in shards:
+            for route, stats in list(shard.items()):
+                totals.setdefault(route, _RouteStats()).add(stats)
+        return totals
+
+    def render(self, extra: Optional[Iterable[Tuple[str, str, str, float]]] = None) -> str:
+        """Prometheus text exposition of everything recorded
+
+        extra adds (name, type, help, value) samples computed at scrape
+        time, such as key-store totals.
+        """
+        totals = sorted(self._totals().items())
+        p = self.prefix
+        lines = []
+
+        def header(name, kind, text):
+            lines.append(f"# HELP {p}_{name} {text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+
+        header("requests_total", "counter", "Requests handled, by route")
+        for route, stats in totals:
+            lines.append(f'{p}_requests_total{{route="{route}"}} {stats.requests}')
+        header("errors_total", "counter", "Requests that failed (HTTP error or success false), by route")
+        for route, stats in totals:
+            lines.append(f'{p}_errors_total{{route="{route}"}} {stats.errors}')
+
+        for name, text, bounds, field in (
+                ("request_duration_seconds", "Request latency, by route", LATENCY_BUCKETS, "latency"),
+                ("request_size_bytes", "Request body size, by route", SIZE_BUCKETS, "size")):
+            header(name, "histogram", text)
+            for route, stats in totals:
+                cumulative = 0
+                for bound, count in zip(bounds + (float("inf"),), getattr(stats, field)):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(f'{p}_{name}_bucket{{route="{route}",le="{le}"}} {cumulative}')
+                lines.append(f'{p}_{name}_sum{{route="{route}"}} {getattr(stats, field + "_sum")}')
+                lines.append(f'{p}_{name}_count{{route="{route}"}} {stats.requests}')
+
+        for name, kind, text, value in extra or ():
+            header(name, kind, text)
+            lines.append(f"{p}_{name} {value}")
+        return "\n".join(lines) + "\n"
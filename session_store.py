@@ -0,0 +1,356 @@
+"""
+SQLite Session Store
+Per-session BB84 protocol state in one SQLite database (WAL mode)
+
+Each exchange is a row in sessions (ID, phase, version, last update),
+indexed by phase, and each of its fields is a row in fields keyed by
+(session ID, field name). A save writes only the fields that changed
+since the state was loaded, so a step that sets "phase" and "final_key"
+never rewrites Alice's qubit arrays, and one exchange never touches
+another's rows.
+
+WAL mode lets readers run while a writer commits, and writes use
+BEGIN IMMEDIATE with a busy timeout, so hundreds of concurrent exchanges
+share the file safely. Saves are a per-field compare-and-swap on the
+session version: fields another app changed meanwhile are kept, and a
+field both changed differently raises VersionConflict. A save with
+nothing changed writes nothing and leaves the version alone, so it
+never wakes the partner's waiters.
+
+Every save bumps the session's version, so the store caches each
+session's parsed fields under the version they were read at. A load
+whose session is still at that version (one indexed lookup) is served
+from the cache without reading or parsing any field, and a save that
+was the only write since keeps the cache current.
+
+wait_for_change() blocks a caller on a Condition until its session's
+version moves. This is polling, not a push from SQLite: one watcher
+thread per store checks data_version (a counter that moves when any
+connection commits, in any process) every WATCH_INTERVAL (20 ms) and
+reads session versions only when it moved. Waiters sleep rather than
+query the database themselves, but each still holds its thread, and
+wakes up to one interval after the save.
+
+PackedBits values and NumPy index arrays (the qubit bits and bases,
+sifted bits, matching indices) are not put in the database: each is
+written once to a binary file in <database>.arrays/ and its field row
+holds only a reference (see sidecar_arrays), which loads memory-map.
+An array the caller did not replace keeps its file across saves; the
+file of one it did replace is deleted by a later save once ARRAY_GRACE
+has passed, so a reader still loading the old version finds it.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from shared_state import SharedState, VersionConflict, snapshot
+from sidecar_arrays import SIDECAR_MARKER, SidecarArrays, is_sidecar_ref, stores_in_sidecar
+
+DEFAULT_SESSION = "default"
+
+# Milliseconds a writer waits for another writer's transaction
+BUSY_TIMEOUT_MS = 5000
+
+# Seconds between the watcher thread's checks for commits
+WATCH_INTERVAL = 0.02
+
+# Seconds an unreferenced array file is kept, covering saves not yet committed
+# and readers still mapping a replaced file
+ARRAY_GRACE = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    phase TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_phase ON sessions (phase, updated);
+CREATE TABLE IF NOT EXISTS fields (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (session_id, name)
+) WITHOUT ROWID;
+"""
+
+
+class SessionState(SharedState):
+    """SharedState that also knows which session it belongs to"""
+
+    def __init__(self, session_id: str, fields: dict, version: int = 0, base: Optional[dict] = None):
+        super().__init__(fields, version, base)
+        self.session_id = session_id
+        # Field name -> the array object behind the sidecar reference in base
+        self.arrays = {}
+
+
+class SessionInfo(NamedTuple):
+    """One row of the sessions table"""
+    session_id: str
+    phase: str
+    version: int
+    updated: float
+
+
+class _CachedSession(NamedTuple):
+    """Fields of a session as stored (raw) and decoded, at one version"""
+    version: int
+    raw: dict
+    fields: dict
+
+
+class SessionStore:
+    """Versioned per-field protocol state for many concurrent sessions"""
+
+    def __init__(self, path, default: Callable[[], dict], arrays_dir=None):
+        self.path = str(path)
+        self.default = default
+        self.sidecars = SidecarArrays(arrays_dir or self.path + ".arrays")
+        self._local = threading.local()
+        self._cache: Dict[str, _CachedSession] = {}
+        self._cache_lock = threading.Lock()
+        # (time replaced, file name) of array files superseded by our saves
+        self._superseded: Deque[Tuple[float, str]] = deque()
+        self._superseded_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._generation = 0
+        self._watcher: Optional[threading.Thread] = None
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection (sqlite3 connections are per thread)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.db = db
+        return db
+
+    def version(self, session_id: str) -> int:
+        """Current version of a session (0 if it does not exist), one indexed lookup"""
+        row = self._connect().execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _state(self, session_id: str, cached: _CachedSession) -> SessionState:
+        """Fresh state from a cache entry; callers may edit it freely"""
+        state = SessionState(session_id, snapshot(cached.fields), cached.version, dict(cached.raw))
+        state.arrays = {name: cached.fields[name] for name, value in cached.raw.items()
+                        if is_sidecar_ref(value)}
+        return state
+
+    def _decode(self, raw: dict) -> dict:
+        """Stored field values with sidecar references mapped"""
+        return {name: self.sidecars.read(value) if is_sidecar_ref(value) else value
+                for name, value in raw.items()}
+
+    def _encode(self, state: SessionState) -> dict:
+        """Field values as stored, writing a sidecar file for each new array"""
+        encoded = {}
+        for name, value in state.items():
+            if not stores_in_sidecar(value):
+                encoded[name] = value
+            elif state.arrays.get(name) is value and is_sidecar_ref(state.base.get(name)):
+                encoded[name] = state.base[name]
+            else:
+                encoded[name] = self.sidecars.write(value)
+        return encoded
+
+    def load(self, session_id: str = DEFAULT_SESSION) -> SessionState:
+        """State of a session, or the default state for a new one
+
+        Served from the cache when the session has not been saved since
+        it was last read. An array file deleted between reading the rows
+        and mapping it (a newer version replaced it) means one reread.
+        """
+        cached = self._cache.get(session_id)
+        if cached is not None and cached.version == self.version(session_id):
+            return self._state(session_id, cached)
+        try:
+            return self._load(session_id)
+        except FileNotFoundError:
+            return self._load(session_id)
+
+    def _load(self, session_id: str) -> SessionState:
+        """Read a session's rows and refresh its cache entry"""
+        db = self._connect()
+        db.execute("BEGIN")
+        try:
+            row = db.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            raw = {name: json.loads(value) for name, value in db.execute(
+                "SELECT name, value FROM fields WHERE session_id = ?", (session_id,))}
+        finally:
+            db.execute("COMMIT")
+        if row is None:
+            return SessionState(session_id, self.default())
+        cached = _CachedSession(row[0], raw, self._decode(raw))
+        with self._cache_lock:
+            self._cache[session_id] = cached
+        return self._state(session_id, cached)
+
+    def save(self, state: SessionState) -> int:
+        """Write the fields changed since load and return the new version"""
+        encoded = self._encode(state)
+        missing = object()
+        changed = {name: value for name, value in encoded.items()
+                   if state.base.get(name, missing) != value}
+        if not changed:
+            return state.version
+        previous = state.base
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT version FROM sessions WHERE session_id = ?",
+                             (state.session_id,)).fetchone()
+            current_version = row[0] if row else 0
+            if current_version != state.version:
+                current = {name: json.loads(value) for name, value in db.execute(
+                    f"SELECT name, value FROM fields WHERE session_id = ? AND name IN "
+                    f"({','.join('?' * len(changed))})", (state.session_id, *changed))}
+                clashes = {name for name, value in changed.items()
+                           if current.get(name, missing) != state.base.get(name, missing)
+                           and current.get(name, missing) != value}
+                if clashes:
+                    raise VersionConflict(clashes)
+                previous = current
+
+            version = current_version + 1
+            self._write(db, state.session_id, changed, state.get("phase", ""), version)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+        self._supersede([previous[name][SIDECAR_MARKER] for name, value in changed.items()
+                         if is_sidecar_ref(previous.get(name)) and previous[name] != value])
+        changed = snapshot(changed)
+        state.base.update(changed)
+        state.arrays.update((name, state[name]) for name, value in changed.items()
+                            if is_sidecar_ref(value))
+        state.version = version
+        with self._cache_lock:
+            cached = self._cache.get(state.session_id)
+            if cached is not None and cached.version == current_version:
+                # Nobody else wrote in between: the cache plus our fields is the new row set
+                raw = dict(cached.raw)
+                raw.update(changed)
+                fields = dict(cached.fields)
+                fields.update(self._decode(changed))
+                self._cache[state.session_id] = _CachedSession(version, raw, fields)
+            else:
+                self._cache.pop(state.session_id, None)
+        return version
+
+    def _supersede(self, names: List[str]):
+        """Queue replaced array files and delete those replaced over ARRAY_GRACE ago"""
+        now = time.time()
+        expired = []
+        with self._superseded_lock:
+            self._superseded.extend((now, name) for name in names)
+            while self._superseded and self._superseded[0][0] <= now - ARRAY_GRACE:
+                expired.append(self._superseded.popleft()[1])
+        for name in expired:
+            self.sidecars.remove(name)
+
+    @staticmethod
+    def _write(db: sqlite3.Connection, session_id: str, fields: dict, phase: str, version: int):
+        """Upsert encoded fields and the session row (inside the caller's transaction)"""
+        db.executemany(
+            "INSERT INTO fields (session_id, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id, name) DO UPDATE SET value = excluded.value",
+            [(session_id, name, json.dumps(value)) for name, value in fields.items()])
+        db.execute(
+            "INSERT INTO sessions (session_id, phase, version, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET phase = excluded.phase, "
+            "version = excluded.version, updated = excluded.updated",
+            (session_id, phase, version, time.time()))
+
+    def reset(self, session_id: str = DEFAULT_SESSION) -> int:
+        """Replace a session's state with the default, keeping its version increasing"""
+        default = self._encode(SessionState(session_id, self.default()))
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            version = (row[0] if row else 0) + 1
+            db.execute("DELETE FROM fields WHERE session_id = ?", (session_id,))
+            self._write(db, session_id, default, default.get("phase", ""), version)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.collect_arrays()
+        return version
+
+    def collect_arrays(self) -> int:
+        """Delete array files no session refers to any more; returns how many"""
+        referenced = [json.loads(value)[SIDECAR_MARKER] for (value,) in self._connect().execute(
+            "SELECT value FROM fields WHERE value LIKE ?", (f'%"{SIDECAR_MARKER}"%',))]
+        return self.sidecars.collect(referenced, time.time() - ARRAY_GRACE)
+
+    def _watch(self):
+        """Watcher thread: wake waiters whenever the database is committed to"""
+        db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        seen = db.execute("PRAGMA data_version").fetchone()[0]
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            data_version = db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != seen:
+                seen = data_version
+                with self._changed:
+                    self._generation += 1
+                    self._changed.notify_all()
+
+    def wait_for_change(self, session_id: str, version: int, timeout: Optional[float] = None) -> bool:
+        """Block until the session is saved past version; False on timeout"""
+        with self._changed:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="session-store-watcher", daemon=True)
+                self._watcher.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Note the generation first so a commit after the check still wakes us
+            with self._changed:
+                generation = self._generation
+            if self.version(session_id) != version:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            with self._changed:
+                if self._generation == generation:
+                    self._changed.wait(remaining)
+
+    def sessions(self, phase: Optional[str] = None) -> List[SessionInfo]:
+        """Sessions, most recently updated first, optionally only those in one phase"""
+        query = "SELECT session_id, phase, version, updated FROM sessions"
+        params = ()
+        if phase is not None:
+            query += " WHERE phase = ?"
+            params = (phase,)
+        return [SessionInfo(*row) for row in
+                self._connect().execute(query + " ORDER BY updated DESC", params)]
+
+    def delete(self, session_id: str):
+        """Remove a session and all its fields"""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM fields WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        # A recreated session starts again at version 1
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+        self.collect_arrays()
@@ -0,0 +1,94 @@
+"""
+Shared State Helpers
+Locking, atomic writes and versioned state shared by the stores
+
+file_lock takes an advisory lock on a sidecar .lock file (fcntl on
+POSIX, msvcrt on Windows) and atomic_write_json writes a document to a
+temp file in the same directory, syncs it and os.replaces it over the
+old one, so readers never see a half-written file (the key store's
+state file relies on both).
+
+SharedState is a state dict that remembers the version and field values
+it was loaded from, so a store can apply only the fields a writer
+changed on top of newer data (compare-and-swap per field) and raise
+VersionConflict when a field was changed differently by both, instead
+of silently overwriting the other app's work. session_store builds the
+apps' per-session store on these.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class SharedStateError(Exception):
+    """Shared state cannot be read or saved"""
+
+
+class VersionConflict(SharedStateError):
+    """Another writer changed the same fields since this state was loaded"""
+
+    def __init__(self, fields):
+        super().__init__(f"Changed by another app since loading: {', '.join(sorted(fields))}")
+        self.fields = fields
+
+
+class SharedState(dict):
+    """State dict that remembers the version and field values it was loaded from"""
+
+    def __init__(self, fields: dict, version: int = 0, base: Optional[dict] = None):
+        super().__init__(fields)
+        self.version = version
+        self.base = base or {}
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive advisory lock on path (created if missing), across processes"""
+    with open(path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_json(path: str, document, indent: Optional[int] = None):
+    """Write JSON to a temp file beside path, flush it to disk and rename it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def snapshot(document: dict) -> dict:
+    """Copy of the raw document that later in-place edits of the state cannot touch"""
+    return {key: list(value) if isinstance(value, list) else
+            dict(value) if isinstance(value, dict) else value
+            for key, value in document.items()}
@@ -0,0 +1,118 @@
+"""
+Sidecar Arrays
+Large qubit arrays kept as packed binary files beside the session database
+
+A PackedBits value or NumPy integer array is written once to its own
+file (temp file, fsync, rename) under a fresh name and never modified,
+and the state only holds a small reference: the file name, dtype and
+length. Readers np.memmap the file read-only, so Bob gets Alice's
+million-qubit bases as a view of the page cache with no parsing and no
+copy, and a reader never sees a file change under it.
+
+Files a save replaced are removed with remove() once no reader can
+still be loading them, and any other files no session refers to any
+more by collect().
+"""
+
+import os
+import tempfile
+import uuid
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from packed_bits import PackedBits
+
+SIDECAR_MARKER = "__sidecar__"
+BITS_DTYPE = "bits"
+
+# Integer dtypes stored as raw little-endian arrays
+ARRAY_DTYPES = ("int32", "int64", "uint8")
+
+SUFFIX = ".bin"
+
+
+def is_sidecar_ref(value) -> bool:
+    """True for the reference dicts write() returns"""
+    return isinstance(value, dict) and SIDECAR_MARKER in value
+
+
+def stores_in_sidecar(value) -> bool:
+    """Whether write() takes this value (anything else stays inline JSON)"""
+    if isinstance(value, PackedBits):
+        return True
+    return isinstance(value, np.ndarray) and value.ndim == 1 and value.dtype.name in ARRAY_DTYPES
+
+
+class SidecarArrays:
+    """Directory of write-once, memory-mapped array files"""
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, value: Union[PackedBits, np.ndarray]) -> dict:
+        """Store an array in a new file and return its reference"""
+        if isinstance(value, PackedBits):
+            # The word-padded buffer, so readers can wrap the map without copying
+            data, dtype = value.packed, BITS_DTYPE
+        else:
+            data, dtype = value.astype(value.dtype.newbyteorder("<"), copy=False), value.dtype.name
+        name = uuid.uuid4().hex + SUFFIX
+        ref = {SIDECAR_MARKER: name, "dtype": dtype, "length": len(value)}
+        if data.nbytes == 0:
+            return ref
+
+        path = os.path.join(self.directory, name)
+        fd, temp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(memoryview(np.ascontiguousarray(data)).cast("B"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        return ref
+
+    def read(self, ref: dict) -> Union[PackedBits, np.ndarray]:
+        """Read-only memory map of a stored array"""
+        dtype, length = ref["dtype"], ref["length"]
+        path = os.path.join(self.directory, os.path.basename(ref[SIDECAR_MARKER]))
+        if dtype == BITS_DTYPE:
+            if length == 0:
+                return PackedBits()
+            return PackedBits(np.memmap(path, dtype=np.uint8, mode="r"), length)
+        if dtype not in ARRAY_DTYPES:
+            raise ValueError(f"Unknown sidecar dtype {dtype!r}")
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"), mode="r", shape=(length,))
+
+    def remove(self, name: str):
+        """Delete one array file (already gone, or mapped on Windows: left alone)"""
+        try:
+            os.unlink(os.path.join(self.directory, os.path.basename(name)))
+        except OSError:
+            pass
+
+    def collect(self, referenced: Iterable[str], older_than: Optional[float] = None) -> int:
+        """Delete files not in referenced (names), skipping ones newer than older_than"""
+        keep = set(referenced)
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(SUFFIX) or entry.name in keep:
+                continue
+            try:
+                if older_than is not None and entry.stat().st_mtime > older_than:
+                    continue
+                # Open maps stay valid on POSIX; Windows refuses while one is open
+                os.unlink(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -16,8 +16,6 @@ Features:
 """
 
 import streamlit as st
-import random
-import hashlib
 import time
 import pandas as pd
 import numpy as np
@@ -25,6 +23,13 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import base64
 
+from bb84_engine import prepare_qubits_packed, transmit_qubits_packed, measure_qubits_packed, sift_packed
+from bb84_qber import sample_qber, DEFAULT_SAMPLE_FRACTION
+from packed_bits import PackedBits
+from cascade_reconciliation import cascade_reconcile
+from ldpc_reconciliation import MAX_LDPC_QBER, ldpc_reconcile
+from privacy_amplification import derive_final_key, secure_key_length, MIN_TOEPLITZ_BITS
+
 # Configure page
 st.set_page_config(
     page_title="BB84 Quantum Key Generator",
@@ -83,13 +88,13 @@ st.markdown("""
 # Initialize session state
 def init_session_state():
     if 'alice_bits' not in st.session_state:
-        st.session_state.alice_bits = []
+        st.session_state.alice_bits = PackedBits()
     if 'alice_bases' not in st.session_state:
-        st.session_state.alice_bases = []
+        st.session_state.alice_bases = PackedBits()
     if 'bob_bases' not in st.session_state:
-        st.session_state.bob_bases = []
+        st.session_state.bob_bases = PackedBits()
     if 'bob_results' not in st.session_state:
-        st.session_state.bob_results = []
+        st.session_state.bob_results = PackedBits()
     if 'sifted_bits' not in st.session_state:
         st.session_state.sifted_bits = []
     if 'final_key' not in st.session_state:
@@ -98,19 +103,22 @@ def init_session_state():
         st.session_state.phase = "setup"
     if 'error_rate' not in st.session_state:
         st.session_state.error_rate = 0.0
+    if 'leaked_bits' not in st.session_state:
+        st.session_state.leaked_bits = None
     if 'eve_present' not in st.session_state:
         st.session_state.eve_present = False
 
 def reset_protocol():
     """Reset the protocol to initial state"""
-    st.session_state.alice_bits = []
-    st.session_state.alice_bases = []
-    st.session_state.bob_bases = []
-    st.session_state.bob_results = []
+    st.session_state.alice_bits = PackedBits()
+    st.session_state.alice_bases = PackedBits()
+    st.session_state.bob_bases = PackedBits()
+    st.session_state.bob_results = PackedBits()
     st.session_state.sifted_bits = []
     st.session_state.final_key = ""
     st.session_state.phase = "setup"
     st.session_state.error_rate = 0.0
+    st.session_state.leaked_bits = None
     # Clear any other stored data
     if 'transmitted_bits' in st.session_state:
         del st.session_state.transmitted_bits
@@ -121,116 +129,71 @@ def reset_protocol():
 
 def generate_qubits(num_qubits, method="random"):
     """Generate Alice's qubits"""
-    bits = []
-    bases = []
-    
-    for i in range(num_qubits):
-        if method == "random":
-            bits.append(random.randint(0, 1))
-            bases.append(random.randint(0, 1))
-        else:  # manual - simplified to random for web interface
-            bits.append(random.randint(0, 1))
-            bases.append(random.randint(0, 1))
-    
-    return bits, bases
+    # manual - simplified to random for web interface
+    return prepare_qubits_packed(num_qubits)
 
 def simulate_transmission(alice_bits, alice_bases, has_eavesdropper=False):
     """Simulate quantum transmission with optional eavesdropper"""
-    transmitted_bits = alice_bits.copy()
-    eve_activity = []
-    
-    if has_eavesdropper:
-        for i in range(len(transmitted_bits)):
-            if random.random() < 0.6:  # 60% interception rate
-                eve_activity.append(f"Qubit {i+1}: Intercepted!")
-                if random.random() < 0.5:  # Wrong basis 50% of time
-                    transmitted_bits[i] = random.randint(0, 1)
-            else:
-                eve_activity.append(f"Qubit {i+1}: Passed through")
-    
-    return transmitted_bits, eve_activity
+    return transmit_qubits_packed(alice_bits, alice_bases, has_eavesdropper)
 
 def bob_measurement(alice_bases, transmitted_bits, method="random"):
     """Simulate Bob's measurements"""
-    bob_bases = []
-    bob_results = []
-    
-    for i in range(len(transmitted_bits)):
-        if method == "random":
-            basis = random.randint(0, 1)
-        else:
-            basis = random.randint(0, 1)  # Simplified
-        
-        bob_bases.append(basis)
-        
-        # Measurement result
-        if alice_bases[i] == basis:
-            result = transmitted_bits[i]
-        else:
-            result = random.randint(0, 1)
-        
-        bob_results.append(result)
-    
-    return bob_bases, bob_results
+    # manual - simplified to random
+    return measure_qubits_packed(alice_bases, transmitted_bits)
 
 def perform_sifting(alice_bits, alice_bases, bob_bases, bob_results):
     """Perform basis sifting"""
-    sifted_bits = []
-    matching_indices = []
-    
     # Ensure all arrays have the same length
     min_length = min(len(alice_bits), len(alice_bases), len(bob_bases), len(bob_results))
     
-    for i in range(min_length):
-        if alice_bases[i] == bob_bases[i]:
-            sifted_bits.append(int(bob_results[i]))  # Ensure integer
-            matching_indices.append(i)
+    sifted_bits, matching_indices = sift_packed(alice_bases[:min_length], bob_bases, bob_results)
     
-    return sifted_bits, matching_indices
+    return PackedBits.from_array(sifted_bits), matching_indices
 
-def error_checking(alice_bits, sifted_bits, matching_indices, has_eavesdropper=False):
-    """Perform error checking on all sifted bits"""
+def error_checking(alice_bits, sifted_bits, matching_indices, sample_fraction=DEFAULT_SAMPLE_FRACTION):
+    """Estimate the error rate from a random sample of the sifted bits"""
     total_bits = len(sifted_bits)
     if total_bits == 0:
         st.warning("⚠️ No sifted bits available for error checking")
-        return 0.0, 0, []
-    
-    st.info(f"🔧 Error checking {total_bits} sifted bits")
-    
-    errors = 0
-    
-    # Check all bits
-    for idx in range(total_bits):
-        if idx < len(matching_indices) and matching_indices[idx] < len(alice_bits):
-            alice_bit = alice_bits[matching_indices[idx]]
-            bob_bit = sifted_bits[idx]
-            if alice_bit != bob_bit:
-                errors += 1
-    
-    # Add eavesdropper errors
-    if has_eavesdropper:
-        if errors == 0:
-            additional_errors = random.randint(1, max(1, total_bits // 10))
-            errors += additional_errors
-            st.info(f"🔧 Added {additional_errors} eavesdropper errors")
-        else:
-            additional_errors = random.randint(0, max(1, total_bits // 20))
-            errors += additional_errors
-            if additional_errors > 0:
-                st.info(f"🔧 Added {additional_errors} additional eavesdropper errors")
+        return None, sifted_bits, matching_indices
     
-    error_rate = errors / total_bits if total_bits > 0 else 0
+    estimate = sample_qber(alice_bits, sifted_bits, matching_indices, sample_fraction)
+    st.info(f"🔧 Compared {estimate.sample_size} of {total_bits} sifted bits: "
+            f"{estimate.errors} errors, QBER {estimate.error_rate:.3f} "
+            f"(95% CI {estimate.ci_low:.3f} – {estimate.ci_high:.3f})")
     
-    # Remove some bits that were "used" for error checking
-    # Be more conservative to ensure we have enough bits left
-    sacrifice_count = min(errors + 1, max(1, len(sifted_bits) // 8))  # Less aggressive sacrifice
-    remaining_bits = sifted_bits[:-sacrifice_count] if sacrifice_count > 0 and sacrifice_count < len(sifted_bits) else sifted_bits
+    # The sampled bits were compared publicly, so remove exactly those
+    remaining_bits = PackedBits.from_array(estimate.discard(sifted_bits))
+    remaining_indices = estimate.discard(matching_indices)
     
-    st.info(f"🔧 Sacrificed {sacrifice_count} bits, {len(remaining_bits)} remaining")
+    st.info(f"🔧 Sacrificed {estimate.sample_size} bits, {len(remaining_bits)} remaining")
     
-    return error_rate, errors, remaining_bits
+    return estimate, remaining_bits, remaining_indices
+
+def reconcile_keys(alice_bits, sifted_bits, matching_indices, error_rate, method="Cascade"):
+    """Reconcile Bob's sifted bits against Alice's with Cascade or LDPC"""
+    if len(sifted_bits) == 0:
+        return sifted_bits, 0, matching_indices
+    
+    alice_key = alice_bits.take(matching_indices)
+    if method == "LDPC" and error_rate > MAX_LDPC_QBER:
+        st.warning(f"⚠️ No LDPC code is rated for QBER {error_rate:.1%} "
+                   f"(at most {MAX_LDPC_QBER:.0%}), using Cascade")
+        method = "Cascade"
+    if method == "LDPC":
+        result = ldpc_reconcile(alice_key, sifted_bits, error_rate)
+        # Frames that failed to decode are dropped on both sides
+        matching_indices = np.asarray(matching_indices)[result.kept]
+        st.info(f"🔧 LDPC corrected {result.corrected_errors} errors from one syndrome message "
+                f"({result.leaked_bits} bits disclosed, {result.failed_frames} frames dropped)")
+    else:
+        result = cascade_reconcile(alice_key, sifted_bits, error_rate)
+        st.info(f"🔧 Cascade corrected {result.corrected_errors} errors, "
+                f"disclosing {result.leaked_bits} parity bits")
+    
+    return PackedBits.from_array(result.corrected_key), result.leaked_bits, matching_indices
 
-def generate_final_key(sifted_bits):
+def generate_final_key(sifted_bits, error_rate=0.0, leaked_bits=None):
     """Generate final key using privacy amplification"""
     if not sifted_bits or len(sifted_bits) < 4:
         st.error(f"❌ Not enough bits! Have {len(sifted_bits) if sifted_bits else 0}, need at least 4")
@@ -238,43 +201,25 @@ def generate_final_key(sifted_bits):
     
     try:
         # Debug: Show the sifted bits
-        st.info(f"🔧 Debug: Processing {len(sifted_bits)} sifted bits: {sifted_bits[:10]}...")
+        st.info(f"🔧 Debug: Processing {len(sifted_bits)} sifted bits: {list(sifted_bits[:10])}...")
         
         # Ensure all bits are 0 or 1
-        clean_bits = []
-        for bit in sifted_bits:
-            if bit in [0, 1]:
-                clean_bits.append(bit)
-            else:
-                st.warning(f"⚠️ Invalid bit value: {bit}, converting to 0")
-                clean_bits.append(0)
+        bits = np.asarray(sifted_bits)
+        invalid = np.count_nonzero(bits > 1)
+        if invalid:
+            st.warning(f"⚠️ {invalid} invalid bit values, converting to 0")
+            bits = np.where(bits > 1, 0, bits)
         
-        bit_string = ''.join(str(b) for b in clean_bits)
-        st.info(f"🔧 Debug: Bit string length: {len(bit_string)}")
+        output_bits = secure_key_length(len(bits), error_rate, leaked_bits)
+        if output_bits >= MIN_TOEPLITZ_BITS:
+            st.info(f"🔧 Debug: Toeplitz hashing {len(bits)} bits down to {output_bits - output_bits % 8} secure bits")
+        else:
+            st.info(f"🔧 Debug: Only {output_bits} secure bits, hashing with SHA-256")
         
-        # Ensure we have valid binary string
-        if not bit_string or not all(c in '01' for c in bit_string):
-            st.error(f"❌ Invalid binary string: {bit_string[:20]}...")
-            return None
-            
-        # Pad to multiple of 8
-        while len(bit_string) % 8 != 0:
-            bit_string += '0'
+        final_key = derive_final_key(bits, error_rate, output_bits)
         
-        st.info(f"🔧 Debug: Padded bit string length: {len(bit_string)}")
-        
-        # Convert to bytes and hash
-        try:
-            byte_data = bytes(int(bit_string[i:i+8], 2) for i in range(0, len(bit_string), 8))
-            final_key = hashlib.sha256(byte_data).hexdigest()
-            
-            st.success(f"✅ Key generated successfully! Length: {len(final_key)} characters")
-            return final_key
-            
-        except ValueError as ve:
-            st.error(f"❌ Byte conversion error: {str(ve)}")
-            st.error(f"Problematic bit string: {bit_string}")
-            return None
+        st.success(f"✅ Key generated successfully! Length: {len(final_key)} characters")
+        return final_key
         
     except Exception as e:
         st.error(f"❌ Key generation error: {str(e)}")
@@ -299,7 +244,7 @@ def create_visualization(alice_bits, alice_bases, bob_bases, bob_results, phase)
     
     # Alice's bits
     fig.add_trace(
-        go.Scatter(x=x_vals, y=alice_bits[:display_limit], 
+        go.Scatter(x=x_vals, y=alice_bits[:display_limit].tolist(), 
                   mode='markers+lines', name='Alice Bits',
                   marker=dict(color='pink', size=8)),
         row=1, col=1
@@ -307,7 +252,7 @@ def create_visualization(alice_bits, alice_bases, bob_bases, bob_results, phase)
     
     # Alice's bases
     fig.add_trace(
-        go.Scatter(x=x_vals, y=alice_bases[:display_limit], 
+        go.Scatter(x=x_vals, y=alice_bases[:display_limit].tolist(), 
                   mode='markers+lines', name='Alice Bases',
                   marker=dict(color='lightcoral', size=8)),
         row=1, col=2
@@ -316,7 +261,7 @@ def create_visualization(alice_bits, alice_bases, bob_bases, bob_results, phase)
     # Bob's bases (if available)
     if bob_bases:
         fig.add_trace(
-            go.Scatter(x=x_vals, y=bob_bases[:display_limit], 
+            go.Scatter(x=x_vals, y=bob_bases[:display_limit].tolist(), 
                       mode='markers+lines', name='Bob Bases',
                       marker=dict(color='lightblue', size=8)),
             row=2, col=1
@@ -325,7 +270,7 @@ def create_visualization(alice_bits, alice_bases, bob_bases, bob_results, phase)
     # Bob's results (if available)
     if bob_results:
         fig.add_trace(
-            go.Scatter(x=x_vals, y=bob_results[:display_limit], 
+            go.Scatter(x=x_vals, y=bob_results[:display_limit].tolist(), 
                       mode='markers+lines', name='Bob Results',
                       marker=dict(color='cyan', size=8)),
             row=2, col=2
@@ -357,6 +302,10 @@ def main():
     num_qubits = st.sidebar.slider("Number of Qubits", 10, 150, 20)
     method = st.sidebar.selectbox("Preparation Method", ["random", "manual"])
     has_eavesdropper = st.sidebar.checkbox("Add Eavesdropper (Eve)", value=False)
+    sample_fraction = st.sidebar.slider("QBER Sample Fraction", 0.05, 0.5, DEFAULT_SAMPLE_FRACTION,
+                                        help="Share of sifted bits publicly compared to estimate the error rate")
+    reconciliation = st.sidebar.selectbox("Reconciliation", ["Cascade", "LDPC"],
+                                          help="Interactive parity checks, or a single LDPC syndrome message")
     
     st.session_state.eve_present = has_eavesdropper
     
@@ -412,13 +361,21 @@ def main():
     
     if st.sidebar.button("⚠️ 5. Check Errors") and st.session_state.phase >= "sifted":
         with st.spinner("Checking for errors..."):
-            st.session_state.error_rate, errors, remaining_bits = error_checking(
+            estimate, remaining_bits, remaining_indices = error_checking(
                 st.session_state.alice_bits,
                 st.session_state.sifted_bits,
                 st.session_state.matching_indices,
-                has_eavesdropper
+                sample_fraction
+            )
+            st.session_state.error_rate = estimate.error_rate if estimate else 0.0
+            (st.session_state.sifted_bits, st.session_state.leaked_bits,
+             st.session_state.matching_indices) = reconcile_keys(
+                st.session_state.alice_bits,
+                remaining_bits,
+                remaining_indices,
+                st.session_state.error_rate,
+                reconciliation
             )
-            st.session_state.sifted_bits = remaining_bits
             st.session_state.phase = "error_checked"
         if st.session_state.error_rate > 0.15:
             st.error(f"🚨 High error rate: {st.session_state.error_rate:.3f}")
@@ -438,7 +395,8 @@ def main():
                 st.info("💡 Try using more qubits or reduce eavesdropper interference")
                 st.session_state.final_key = ""
             else:
-                final_key = generate_final_key(st.session_state.sifted_bits)
+                final_key = generate_final_key(st.session_state.sifted_bits, st.session_state.error_rate,
+                                               st.session_state.leaked_bits)
                 if final_key:
                     st.session_state.final_key = final_key
                     st.session_state.phase = "complete"
@@ -467,7 +425,7 @@ def main():
             sample_size = min(20, len(st.session_state.alice_bits))
             df_alice = pd.DataFrame({
                 'Qubit': range(1, sample_size + 1),
-                'Bit': st.session_state.alice_bits[:sample_size],
+                'Bit': st.session_state.alice_bits[:sample_size].tolist(),
                 'Basis': ['+' if b == 0 else '×' for b in st.session_state.alice_bases[:sample_size]]
             })
             st.dataframe(df_alice, use_container_width=True)
@@ -489,7 +447,7 @@ def main():
             df_bob = pd.DataFrame({
                 'Qubit': range(1, sample_size + 1),
                 'Basis': ['+' if b == 0 else '×' for b in st.session_state.bob_bases[:sample_size]],
-                'Result': st.session_state.bob_results[:sample_size],
+                'Result': st.session_state.bob_results[:sample_size].tolist(),
                 'Match': ['✓' if st.session_state.alice_bases[i] == st.session_state.bob_bases[i] 
                          else '✗' for i in range(sample_size)]
             })
@@ -525,11 +483,12 @@ def main():
     if has_eavesdropper and hasattr(st.session_state, 'eve_activity'):
         st.markdown("### 👁️ Eavesdropper Activity")
         with st.expander("Show Eve's Interference"):
-            for activity in st.session_state.eve_activity[:20]:
-                if "Intercepted" in activity:
-                    st.markdown(f"🔍 {activity}")
+            # eve_activity is a per-qubit interception mask
+            for i, intercepted in enumerate(st.session_state.eve_activity[:20]):
+                if intercepted:
+                    st.markdown(f"🔍 Qubit {i+1}: Intercepted!")
                 else:
-                    st.markdown(f"✓ {activity}")
+                    st.markdown(f"✓ Qubit {i+1}: Passed through")
             
             if len(st.session_state.eve_activity) > 20:
                 st.caption(f"Showing first 20 of {len(st.session_state.eve_activity)} activities")